@@ -1,9 +1,14 @@
-import pandas as pd
 import datetime
 import os
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import app_logic # Import các hàm logic từ file app_logic.py
+import background_jobs
+
+# pandas và core_logic (kéo theo openpyxl) mất khoảng một giây để import nên chỉ được import
+# trong TimeReportApp._finish_startup, sau khi cửa sổ đã hiện lên.
+pd = None
+app_logic = None
+STARTUP_DELAY_MS = 50 # Đợi cửa sổ được vẽ xong rồi mới import
 
 # Để bỏ qua cảnh báo UserWarning: Data Validation extension is not supported
 # import openpyxl.worksheet._read_only as read_only
@@ -18,14 +23,43 @@ class TimeReportApp:
         master.title("TRIAC Time Report Generator")
         master.geometry("800x700")
 
-        self.paths = core_logic.setup_paths()
+        self.paths = {}
+        self.template_file = ""
+
+        # Các khung dữ liệu được khởi tạo trong _finish_startup, sau khi đã import pandas
+        self.df_raw = None
+        self.df_cube = None # Khối tổng hợp Year × Month × Week × Project × Task × Workcentre
+        self.df_cube_month = None # Khối cuộn lên Year × Month × Project cho báo cáo so sánh
+        self.cube_index = self.cube_month_index = None # Chỉ mục lọc tương ứng
+        self.report_data = None # Kết quả core_logic.load_report_data (gồm các khung trên), dùng cho báo cáo tiêu chuẩn
+        self.data_version = None # Phiên bản dữ liệu đã nạp, khóa ghi nhớ kết quả so sánh
+        self.current_config = None
+        self.comparison_config = {'years': [], 'months': [], 'selected_projects': []}
+
+        self.create_widgets()
+        # Nạp dữ liệu/xuất báo cáo chạy trên luồng nền để cửa sổ không bị treo
+        self.job_runner = background_jobs.JobRunner(master, on_busy_change=self._set_busy)
+        self._set_busy(True) # Tắt các nút cho đến khi khởi động xong
+        master.after(STARTUP_DELAY_MS, self._finish_startup)
+
+    def _finish_startup(self):
+        """Import pandas/core_logic sau khi cửa sổ đã hiện lên, rồi nạp dữ liệu."""
+        global pd, app_logic
+        self._set_status("Status: Starting...")
+        self.master.update_idletasks()
+        import pandas as pd
+        import core_logic as app_logic
+
+        self.paths = app_logic.setup_paths()
         self.template_file = self.paths['template_file']
+        self.template_path_entry.insert(0, self.template_file)
 
         self.df_raw = pd.DataFrame()
+        self.df_cube = pd.DataFrame()
+        self.df_cube_month = pd.DataFrame()
         self.current_config = {'mode': 'year', 'year': datetime.datetime.now().year, 'months': [], 'project_filter_df': pd.DataFrame()}
-        self.comparison_config = {'years': [], 'months': [], 'selected_projects': []}
 
-        self.create_widgets()
+        self._set_busy(False)
         self.load_initial_data()
 
     def create_widgets(self):
@@ -48,14 +82,24 @@ class TimeReportApp:
         file_frame = ttk.LabelFrame(parent_frame, text="File Selection", padding="10")
         file_frame.pack(padx=10, pady=5, fill='x')
 
-        ttk.Label(file_frame, text="Template File:").grid(row=0, column=0, padx=5, pady=5, sticky='w')
+        ttk.Label(file_frame, text="Template File / Folder:").grid(row=0, column=0, padx=5, pady=5, sticky='w')
         self.template_path_entry = ttk.Entry(file_frame, width=50)
         self.template_path_entry.grid(row=0, column=1, padx=5, pady=5, sticky='ew')
-        self.template_path_entry.insert(0, self.template_file)
         self.browse_button = ttk.Button(file_frame, text="Browse", command=self.browse_template)
         self.browse_button.grid(row=0, column=2, padx=5, pady=5)
+        self.browse_folder_button = ttk.Button(file_frame, text="Browse Folder", command=self.browse_folder)
+        self.browse_folder_button.grid(row=0, column=3, padx=5, pady=5)
         self.load_data_button = ttk.Button(file_frame, text="Load Data", command=self.load_initial_data)
-        self.load_data_button.grid(row=0, column=3, padx=5, pady=5)
+        self.load_data_button.grid(row=0, column=4, padx=5, pady=5)
+        self.clear_cache_button = ttk.Button(file_frame, text="Clear Cache", command=self.clear_data_cache)
+        self.clear_cache_button.grid(row=0, column=5, padx=5, pady=5)
+        self.cancel_button = ttk.Button(file_frame, text="Cancel", command=self.cancel_running_job, state=tk.DISABLED)
+        self.cancel_button.grid(row=0, column=6, padx=5, pady=5)
+        # Workbook quá lớn: chỉ nạp khối tổng hợp theo lô, báo cáo Excel không có dữ liệu chi tiết
+        self.aggregates_only_var = tk.BooleanVar(value=False)
+        self.aggregates_only_check = ttk.Checkbutton(file_frame, text="Aggregates only (large workbooks, no raw detail in Excel)",
+                                                     variable=self.aggregates_only_var)
+        self.aggregates_only_check.grid(row=1, column=1, columnspan=6, padx=5, pady=(0, 5), sticky='w')
         file_frame.grid_columnconfigure(1, weight=1)
 
         # Frame for Configuration
@@ -95,6 +139,9 @@ class TimeReportApp:
         self.generate_pdf_button = ttk.Button(action_frame, text="Generate PDF Report", command=self.generate_standard_pdf_report)
         self.generate_pdf_button.pack(side=tk.LEFT, padx=5, pady=5)
 
+        self.generate_both_button = ttk.Button(action_frame, text="Generate Excel + PDF", command=self.generate_standard_reports)
+        self.generate_both_button.pack(side=tk.LEFT, padx=5, pady=5)
+
         self.status_label = ttk.Label(parent_frame, text="Status: Ready")
         self.status_label.pack(padx=10, pady=5, fill='x')
 
@@ -157,48 +204,119 @@ class TimeReportApp:
         self.generate_comp_pdf_button = ttk.Button(comp_action_frame, text="Generate Comparison PDF", command=self.generate_comparison_pdf_report)
         self.generate_comp_pdf_button.pack(side=tk.LEFT, padx=5, pady=5)
 
+        self.generate_comp_both_button = ttk.Button(comp_action_frame, text="Generate Comparison Excel + PDF", command=self.generate_comparison_reports)
+        self.generate_comp_both_button.pack(side=tk.LEFT, padx=5, pady=5)
+
+        self.comp_cancel_button = ttk.Button(comp_action_frame, text="Cancel", command=self.cancel_running_job, state=tk.DISABLED)
+        self.comp_cancel_button.pack(side=tk.LEFT, padx=5, pady=5)
+
         self.comp_status_label = ttk.Label(parent_frame, text="Status: Ready")
         self.comp_status_label.pack(padx=10, pady=5, fill='x')
 
     def browse_template(self):
-        file_path = filedialog.askopenfilename(filetypes=[("Excel files", "*.xlsm *.xlsx")])
+        file_path = filedialog.askopenfilename(filetypes=[("Excel files", "*.xlsm *.xlsx"), ("SQLite database", "*.db *.sqlite *.sqlite3")])
         if file_path:
             self.template_path_entry.delete(0, tk.END)
             self.template_path_entry.insert(0, file_path)
             self.template_file = file_path
             self.load_initial_data()
 
-    def load_initial_data(self):
-        self.status_label.config(text="Status: Loading data...")
-        self.comp_status_label.config(text="Status: Loading data...")
-        self.master.update_idletasks()
+    def browse_folder(self):
+        # Thư mục chứa các file timesheet theo site/tháng: nạp và gộp tất cả
+        folder_path = filedialog.askdirectory()
+        if folder_path:
+            self.template_path_entry.delete(0, tk.END)
+            self.template_path_entry.insert(0, folder_path)
+            self.template_file = folder_path
+            self.load_initial_data()
 
+    def load_initial_data(self):
         template_file_path = self.template_path_entry.get()
-        if not os.path.exists(template_file_path):
+        if not app_logic.resolve_workbook_paths(template_file_path):
             messagebox.showerror("Error", f"Template file not found at: {template_file_path}")
-            self.status_label.config(text="Status: Error loading data")
-            self.comp_status_label.config(text="Status: Error loading data")
+            self._set_status("Status: Error loading data")
             return
+        aggregates_only = self.aggregates_only_var.get() # Đọc biến Tk trên luồng chính
+
+        def load_job(job):
+            job.report_progress("Status: Loading data...")
+            # Đọc cấu hình và dữ liệu thô với một lần parse mỗi workbook (thư mục: song song trên nhiều process),
+            # dạng gọn vì được giữ suốt phiên làm việc, rồi dựng khối tổng hợp và chỉ mục lọc.
+            # File .db/.sqlite: chỉ khối tổng hợp được tính bằng SQL, hàng chi tiết truy vấn khi xuất từng báo cáo.
+            # Aggregates only, hoặc khi không đủ bộ nhớ: chỉ nạp khối tổng hợp theo lô
+            return app_logic.load_report_data(template_file_path, use_cache=True, aggregated=aggregates_only)
+
+        self._submit_job(load_job, lambda result: self._on_data_loaded(result, aggregates_only), None, "Status: Loading data...",
+                         "An error occurred while loading data", "Status: Error loading data")
+
+    def _on_data_loaded(self, result, aggregates_only=False):
+        # Chỉ gán trên luồng chính, sau khi nạp xong toàn bộ, để dữ liệu cũ vẫn dùng được nếu tác vụ bị hủy
+        self.current_config = result['config']
+        self.report_data = result
+        self.df_raw = result['df_raw']
+        self.df_cube = result['df_cube']
+        self.df_cube_month = result['df_cube_month']
+        self.cube_index = result['cube_index']
+        self.cube_month_index = result['cube_month_index']
+        # Kết quả so sánh ghi nhớ của lần nạp trước không còn dùng được
+        app_logic.clear_comparison_memo()
+        self.data_version = result['data_version']
 
-        try:
-            self.current_config = app_logic.read_configs(template_file_path)
-            self.df_raw = app_logic.load_raw_data(template_file_path)
-
-            if self.df_raw.empty:
-                messagebox.showwarning("Warning", "Raw Data sheet is empty or could not be loaded.")
-                self.status_label.config(text="Status: Data loaded with warnings")
-                self.comp_status_label.config(text="Status: Data loaded with warnings")
-                return
-
-            self.update_standard_config_display()
-            self.populate_comparison_filters()
-            self.status_label.config(text="Status: Data loaded successfully")
-            self.comp_status_label.config(text="Status: Data loaded successfully")
+        if self.df_raw.empty:
+            messagebox.showwarning("Warning", "Raw Data sheet is empty or could not be loaded.")
+            self._set_status("Status: Data loaded with warnings")
+            return
 
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred while loading data: {e}")
-            self.status_label.config(text="Status: Error loading data")
-            self.comp_status_label.config(text="Status: Error loading data")
+        self.update_standard_config_display()
+        self.populate_comparison_filters()
+        if result['aggregated'] and result.get('source') is None:
+            if not aggregates_only:
+                messagebox.showwarning("Warning", "Not enough memory to load the raw data; only aggregates were loaded.\n"
+                                                  "Excel reports will not include the raw detail rows.")
+            self._set_status("Status: Data loaded (aggregates only, Excel reports without raw detail)")
+            return
+        self._set_status("Status: Data loaded successfully")
+
+    def _set_status(self, text, status_label=None):
+        """Cập nhật nhãn trạng thái của một tab, hoặc của cả hai tab nếu status_label là None."""
+        labels = (status_label,) if status_label is not None else (self.status_label, self.comp_status_label)
+        for label in labels:
+            label.config(text=text)
+
+    def _set_busy(self, busy):
+        """Tắt các nút thao tác khi đang có tác vụ nền; chỉ nút Cancel còn bấm được."""
+        action_state = tk.DISABLED if busy else tk.NORMAL
+        for button in (self.browse_button, self.browse_folder_button, self.load_data_button, self.clear_cache_button, self.aggregates_only_check,
+                       self.generate_excel_button, self.generate_pdf_button, self.generate_both_button,
+                       self.generate_comp_excel_button, self.generate_comp_pdf_button, self.generate_comp_both_button):
+            button.config(state=action_state)
+        for button in (self.cancel_button, self.comp_cancel_button):
+            button.config(state=tk.NORMAL if busy else tk.DISABLED)
+
+    def _submit_job(self, job_func, on_success, status_label, start_status, error_message, error_status):
+        """Chạy job_func trên luồng nền; tiến độ, lỗi và hủy được hiển thị trên status_label."""
+        self._set_status(start_status, status_label)
+        self.job_runner.submit(
+            job_func,
+            on_success,
+            on_error=lambda e: self._on_job_error(f"{error_message}: {e}", error_status, status_label),
+            on_progress=lambda message: self._set_status(message, status_label),
+            on_cancel=lambda: self._set_status("Status: Cancelled", status_label),
+        )
+
+    def _on_job_error(self, message, error_status, status_label=None):
+        messagebox.showerror("Error", message)
+        self._set_status(error_status, status_label)
+
+    def cancel_running_job(self):
+        if self.job_runner.is_busy():
+            self.job_runner.cancel()
+            self._set_status("Status: Cancelling...")
+
+    def clear_data_cache(self):
+        template_file_path = self.template_path_entry.get()
+        removed = any([app_logic.invalidate_data_cache(path) for path in app_logic.resolve_workbook_paths(template_file_path)])
+        self._set_status("Status: Cache cleared" if removed else "Status: No cache to clear")
 
     def update_standard_config_display(self):
         # Update Standard Report Tab
@@ -295,14 +413,7 @@ class TimeReportApp:
 
         self.update_comparison_config() # Re-evaluate selections based on new mode
 
-    def generate_standard_excel_report(self):
-        if self.df_raw.empty:
-            messagebox.showwarning("Warning", "No raw data loaded. Please load data first.")
-            return
-
-        self.status_label.config(text="Status: Generating Excel report...")
-        self.master.update_idletasks()
-
+    def _standard_run_config(self):
         # Re-read selected projects from the listbox for the standard report
         selected_indices = self.project_filter_listbox.curselection()
         selected_projects_from_gui = [self.project_filter_listbox.get(i) for i in selected_indices]
@@ -314,118 +425,221 @@ class TimeReportApp:
         # This ensures that only projects explicitly selected by the user are used
         current_run_config = self.current_config.copy()
         current_run_config['project_filter_df'] = temp_project_filter_df
-        
-        # Apply filters
-        df_filtered = app_logic.apply_filters(self.df_raw, current_run_config)
+        return current_run_config
 
-        if df_filtered.empty:
-            messagebox.showwarning("Warning", "No data after applying filters. Report not generated.")
-            self.status_label.config(text="Status: Report generation failed (no data)")
+    def generate_standard_excel_report(self):
+        if self.df_raw.empty:
+            messagebox.showwarning("Warning", "No raw data loaded. Please load data first.")
             return
 
+        current_run_config = self._standard_run_config()
+        report_data = self.report_data
         output_file = self.paths['output_file']
-        success = app_logic.export_report(df_filtered, current_run_config, output_file)
 
-        if success:
-            messagebox.showinfo("Success", f"Standard Excel report generated successfully at:\n{os.path.abspath(output_file)}")
-            self.status_label.config(text="Status: Excel report generated.")
-            os.startfile(os.path.abspath(output_file))
-        else:
-            messagebox.showerror("Error", "Failed to generate standard Excel report.")
-            self.status_label.config(text="Status: Excel report generation failed.")
+        def excel_job(job):
+            # Apply filters
+            df_filtered, df_aggregates, include_raw_data = app_logic.standard_report_frames(report_data, current_run_config)
+            if df_filtered.empty:
+                return None
+            job.check_cancelled()
+            job.report_progress("Status: Writing Excel report...")
+            return app_logic.export_report(df_filtered, current_run_config, output_file, df_aggregates, include_raw_data=include_raw_data)
+
+        def on_done(success):
+            if success is None:
+                messagebox.showwarning("Warning", "No data after applying filters. Report not generated.")
+                self.status_label.config(text="Status: Report generation failed (no data)")
+            elif success:
+                messagebox.showinfo("Success", f"Standard Excel report generated successfully at:\n{os.path.abspath(output_file)}")
+                self.status_label.config(text="Status: Excel report generated.")
+                os.startfile(os.path.abspath(output_file))
+            else:
+                messagebox.showerror("Error", "Failed to generate standard Excel report.")
+                self.status_label.config(text="Status: Excel report generation failed.")
+
+        self._submit_job(excel_job, on_done, self.status_label, "Status: Generating Excel report...",
+                         "An error occurred while generating the Excel report", "Status: Excel report generation failed.")
 
     def generate_standard_pdf_report(self):
         if self.df_raw.empty:
             messagebox.showwarning("Warning", "No raw data loaded. Please load data first.")
             return
-        
-        self.status_label.config(text="Status: Generating PDF report...")
-        self.master.update_idletasks()
 
-        # Re-read selected projects from the listbox for the standard report
-        selected_indices = self.project_filter_listbox.curselection()
-        selected_projects_from_gui = [self.project_filter_listbox.get(i) for i in selected_indices]
-        
-        # Create a temporary project_filter_df for the current run
-        temp_project_filter_df = pd.DataFrame({'Project Name': selected_projects_from_gui, 'Include': ['yes'] * len(selected_projects_from_gui)})
-        
-        # Update current_config with the selected projects from the GUI
-        current_run_config = self.current_config.copy()
-        current_run_config['project_filter_df'] = temp_project_filter_df
-
-        df_filtered = app_logic.apply_filters(self.df_raw, current_run_config)
+        current_run_config = self._standard_run_config()
+        df_cube, cube_index = self.df_cube, self.cube_index
+        pdf_report_path = self.paths['pdf_report']
+        logo_path = self.paths['logo_path']
 
-        if df_filtered.empty:
-            messagebox.showwarning("Warning", "No data after applying filters. PDF report not generated.")
-            self.status_label.config(text="Status: PDF report generation failed (no data)")
+        def pdf_job(job):
+            # Biểu đồ PDF chỉ cần tổng Hours nên lọc trực tiếp trên khối tổng hợp
+            df_filtered = app_logic.apply_filters(df_cube, current_run_config, cube_index)
+            if df_filtered.empty:
+                return None
+            job.check_cancelled()
+            job.report_progress("Status: Rendering charts and writing PDF report...")
+            return app_logic.export_pdf_report(df_filtered, current_run_config, pdf_report_path, logo_path)
+
+        def on_done(success):
+            if success is None:
+                messagebox.showwarning("Warning", "No data after applying filters. PDF report not generated.")
+                self.status_label.config(text="Status: PDF report generation failed (no data)")
+            elif success:
+                messagebox.showinfo("Success", f"Standard PDF report generated successfully at:\n{os.path.abspath(pdf_report_path)}")
+                self.status_label.config(text="Status: PDF report generated.")
+                os.startfile(os.path.abspath(pdf_report_path))
+            else:
+                messagebox.showerror("Error", "Failed to generate standard PDF report.")
+                self.status_label.config(text="Status: PDF report generation failed.")
+
+        self._submit_job(pdf_job, on_done, self.status_label, "Status: Generating PDF report...",
+                         "An error occurred while generating the PDF report", "Status: PDF report generation failed.")
+
+    def _report_results(self, results, status_label, status_prefix):
+        """Thông báo kết quả khi xuất nhiều file cùng lúc; mở các file đã tạo thành công. results: [(tên, đường dẫn, thành công)]."""
+        created = [(name, path) for name, path, success in results if success]
+        failed = [name for name, path, success in results if not success]
+        if created:
+            messagebox.showinfo("Success", "Reports generated successfully:\n" + "\n".join(f"{name}: {os.path.abspath(path)}" for name, path in created))
+        if failed:
+            messagebox.showerror("Error", f"Failed to generate: {', '.join(failed)}.")
+        status_label.config(text=f"Status: {status_prefix} generation failed ({', '.join(failed)})." if failed else f"Status: {status_prefix} generated.")
+        for _, path in created:
+            os.startfile(os.path.abspath(path))
+
+    def generate_standard_reports(self):
+        if self.df_raw.empty:
+            messagebox.showwarning("Warning", "No raw data loaded. Please load data first.")
             return
-            
+
+        current_run_config = self._standard_run_config()
+        report_data = self.report_data
+        output_file = self.paths['output_file']
         pdf_report_path = self.paths['pdf_report']
         logo_path = self.paths['logo_path']
-        success = app_logic.export_pdf_report(df_filtered, current_run_config, pdf_report_path, logo_path)
 
-        if success:
-            messagebox.showinfo("Success", f"Standard PDF report generated successfully at:\n{os.path.abspath(pdf_report_path)}")
-            self.status_label.config(text="Status: PDF report generated.")
-            os.startfile(os.path.abspath(pdf_report_path))
-        else:
-            messagebox.showerror("Error", "Failed to generate standard PDF report.")
-            self.status_label.config(text="Status: PDF report generation failed.")
+        def reports_job(job):
+            # Lọc một lần, dùng chung cho cả Excel và PDF
+            df_filtered, df_aggregates, include_raw_data = app_logic.standard_report_frames(report_data, current_run_config)
+            if df_filtered.empty:
+                return None
+            job.check_cancelled()
+            job.report_progress("Status: Writing Excel and PDF reports...")
+            return app_logic.export_standard_reports(df_filtered, current_run_config, output_file, pdf_report_path, logo_path, df_aggregates,
+                                                     include_raw_data=include_raw_data)
+
+        def on_done(result):
+            if result is None:
+                messagebox.showwarning("Warning", "No data after applying filters. Reports not generated.")
+                self.status_label.config(text="Status: Report generation failed (no data)")
+                return
+            excel_ok, pdf_ok = result
+            self._report_results([("Excel", output_file, excel_ok), ("PDF", pdf_report_path, pdf_ok)],
+                                 self.status_label, "Excel and PDF reports")
+
+        self._submit_job(reports_job, on_done, self.status_label, "Status: Generating Excel and PDF reports...",
+                         "An error occurred while generating the reports", "Status: Report generation failed.")
 
     def generate_comparison_excel_report(self):
         if self.df_raw.empty:
             messagebox.showwarning("Warning", "No raw data loaded. Please load data first.")
             return
 
-        self.comp_status_label.config(text="Status: Generating comparison Excel report...")
-        self.master.update_idletasks()
-
         comparison_mode = self.comparison_mode_var.get()
-        df_comparison, message = app_logic.apply_comparison_filters(self.df_raw, self.comparison_config, comparison_mode)
-
-        if df_comparison.empty:
-            messagebox.showwarning("Warning", f"No data for comparison. {message}")
-            self.comp_status_label.config(text="Status: Comparison report failed (no data)")
-            return
-
+        comparison_config = {key: list(values) for key, values in self.comparison_config.items()}
+        df_cube_month, cube_month_index, data_version = self.df_cube_month, self.cube_month_index, self.data_version
         output_file = self.paths['comparison_output_file']
-        success = app_logic.export_comparison_report(df_comparison, self.comparison_config, output_file, comparison_mode)
 
-        if success:
-            messagebox.showinfo("Success", f"Comparison Excel report generated successfully at:\n{os.path.abspath(output_file)}")
-            self.comp_status_label.config(text="Status: Comparison Excel report generated.")
-            os.startfile(os.path.abspath(output_file))
-        else:
-            messagebox.showerror("Error", "Failed to generate comparison Excel report.")
-            self.comp_status_label.config(text="Status: Comparison Excel report generation failed.")
+        def comparison_excel_job(job):
+            df_comparison, message = app_logic.comparison_results(df_cube_month, comparison_config, comparison_mode, cube_month_index, data_version)
+            if df_comparison.empty:
+                return None, message
+            job.check_cancelled()
+            job.report_progress("Status: Writing comparison Excel report...")
+            return app_logic.export_comparison_report(df_comparison, comparison_config, output_file, comparison_mode), message
+
+        def on_done(result):
+            success, message = result
+            if success is None:
+                messagebox.showwarning("Warning", f"No data for comparison. {message}")
+                self.comp_status_label.config(text="Status: Comparison report failed (no data)")
+            elif success:
+                messagebox.showinfo("Success", f"Comparison Excel report generated successfully at:\n{os.path.abspath(output_file)}")
+                self.comp_status_label.config(text="Status: Comparison Excel report generated.")
+                os.startfile(os.path.abspath(output_file))
+            else:
+                messagebox.showerror("Error", "Failed to generate comparison Excel report.")
+                self.comp_status_label.config(text="Status: Comparison Excel report generation failed.")
+
+        self._submit_job(comparison_excel_job, on_done, self.comp_status_label, "Status: Generating comparison Excel report...",
+                         "An error occurred while generating the comparison Excel report", "Status: Comparison Excel report generation failed.")
 
     def generate_comparison_pdf_report(self):
         if self.df_raw.empty:
             messagebox.showwarning("Warning", "No raw data loaded. Please load data first.")
             return
 
-        self.comp_status_label.config(text="Status: Generating comparison PDF report...")
-        self.master.update_idletasks()
-
         comparison_mode = self.comparison_mode_var.get()
-        df_comparison, message = app_logic.apply_comparison_filters(self.df_raw, self.comparison_config, comparison_mode)
+        comparison_config = {key: list(values) for key, values in self.comparison_config.items()}
+        df_cube_month, cube_month_index, data_version = self.df_cube_month, self.cube_month_index, self.data_version
+        pdf_report_path = self.paths['comparison_pdf_report']
+        logo_path = self.paths['logo_path']
 
-        if df_comparison.empty:
-            messagebox.showwarning("Warning", f"No data for comparison. {message}")
-            self.comp_status_label.config(text="Status: Comparison PDF report failed (no data)")
+        def comparison_pdf_job(job):
+            df_comparison, message = app_logic.comparison_results(df_cube_month, comparison_config, comparison_mode, cube_month_index, data_version)
+            if df_comparison.empty:
+                return None, message
+            job.check_cancelled()
+            job.report_progress("Status: Rendering charts and writing comparison PDF report...")
+            return app_logic.export_comparison_pdf_report(df_comparison, comparison_config, pdf_report_path, comparison_mode, logo_path), message
+
+        def on_done(result):
+            success, message = result
+            if success is None:
+                messagebox.showwarning("Warning", f"No data for comparison. {message}")
+                self.comp_status_label.config(text="Status: Comparison PDF report failed (no data)")
+            elif success:
+                messagebox.showinfo("Success", f"Comparison PDF report generated successfully at:\n{os.path.abspath(pdf_report_path)}")
+                self.comp_status_label.config(text="Status: Comparison PDF report generated.")
+                os.startfile(os.path.abspath(pdf_report_path))
+            else:
+                messagebox.showerror("Error", "Failed to generate comparison PDF report.")
+                self.comp_status_label.config(text="Status: Comparison PDF report generation failed.")
+
+        self._submit_job(comparison_pdf_job, on_done, self.comp_status_label, "Status: Generating comparison PDF report...",
+                         "An error occurred while generating the comparison PDF report", "Status: Comparison PDF report generation failed.")
+
+    def generate_comparison_reports(self):
+        if self.df_raw.empty:
+            messagebox.showwarning("Warning", "No raw data loaded. Please load data first.")
             return
-            
+
+        comparison_mode = self.comparison_mode_var.get()
+        comparison_config = {key: list(values) for key, values in self.comparison_config.items()}
+        df_cube_month, cube_month_index, data_version = self.df_cube_month, self.cube_month_index, self.data_version
+        output_file = self.paths['comparison_output_file']
         pdf_report_path = self.paths['comparison_pdf_report']
         logo_path = self.paths['logo_path']
-        success = app_logic.export_comparison_pdf_report(df_comparison, self.comparison_config, pdf_report_path, comparison_mode, logo_path)
 
-        if success:
-            messagebox.showinfo("Success", f"Comparison PDF report generated successfully at:\n{os.path.abspath(pdf_report_path)}")
-            self.comp_status_label.config(text="Status: Comparison PDF report generated.")
-            os.startfile(os.path.abspath(pdf_report_path))
-        else:
-            messagebox.showerror("Error", "Failed to generate comparison PDF report.")
-            self.comp_status_label.config(text="Status: Comparison PDF report generation failed.")
+        def comparison_reports_job(job):
+            df_comparison, message = app_logic.comparison_results(df_cube_month, comparison_config, comparison_mode, cube_month_index, data_version)
+            if df_comparison.empty:
+                return None, message
+            job.check_cancelled()
+            job.report_progress("Status: Writing comparison Excel and PDF reports...")
+            return app_logic.export_comparison_reports(df_comparison, comparison_config, output_file, pdf_report_path, comparison_mode, logo_path), message
+
+        def on_done(result):
+            outcome, message = result
+            if outcome is None:
+                messagebox.showwarning("Warning", f"No data for comparison. {message}")
+                self.comp_status_label.config(text="Status: Comparison reports failed (no data)")
+                return
+            excel_ok, pdf_ok = outcome
+            self._report_results([("Excel", output_file, excel_ok), ("PDF", pdf_report_path, pdf_ok)],
+                                 self.comp_status_label, "Comparison Excel and PDF reports")
+
+        self._submit_job(comparison_reports_job, on_done, self.comp_status_label, "Status: Generating comparison Excel and PDF reports...",
+                         "An error occurred while generating the comparison reports", "Status: Comparison report generation failed.")
 
 def main():
     root = tk.Tk()
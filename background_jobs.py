@@ -0,0 +1,117 @@
+import queue
+import threading
+
+# Chạy các tác vụ nặng (nạp dữ liệu, xuất báo cáo) trên luồng nền để cửa sổ Tkinter không bị treo.
+# Luồng nền KHÔNG được chạm vào widget: tiến độ và kết quả được đưa vào một queue.Queue,
+# luồng chính đọc queue định kỳ bằng master.after rồi mới gọi các callback cập nhật giao diện.
+
+POLL_INTERVAL_MS = 100
+
+class JobCancelled(Exception):
+    """Tác vụ đã bị người dùng hủy."""
+
+class JobContext:
+    """Được truyền vào hàm tác vụ để báo tiến độ và kiểm tra yêu cầu hủy."""
+
+    def __init__(self, job_queue, cancel_event):
+        self._queue = job_queue
+        self._cancel_event = cancel_event
+
+    def report_progress(self, message):
+        self._queue.put(('progress', message))
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        """Gọi giữa các bước của tác vụ: ném JobCancelled nếu người dùng đã bấm hủy."""
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+class JobRunner:
+    """
+    Chạy tối đa một tác vụ nền tại một thời điểm.
+    Việc hủy mang tính hợp tác: bước đang chạy vẫn chạy hết, các bước sau bị bỏ qua và kết quả bị loại bỏ.
+    """
+
+    def __init__(self, master, on_busy_change=None, poll_interval_ms=POLL_INTERVAL_MS):
+        self.master = master
+        self.on_busy_change = on_busy_change # Gọi với True/False khi tác vụ bắt đầu/kết thúc (bật/tắt nút)
+        self.poll_interval_ms = poll_interval_ms
+        self._queue = None
+        self._cancel_event = None
+
+    def is_busy(self):
+        return self._queue is not None
+
+    def submit(self, func, on_success, on_error=None, on_progress=None, on_cancel=None):
+        """
+        Chạy func(context) trên luồng nền. Các callback luôn được gọi trên luồng chính:
+        on_success(kết quả), on_error(exception), on_progress(thông điệp), on_cancel().
+        Trả về False nếu đang có tác vụ khác chạy.
+        """
+        if self.is_busy():
+            return False
+
+        self._queue = queue.Queue()
+        self._cancel_event = threading.Event()
+        context = JobContext(self._queue, self._cancel_event)
+        callbacks = {'done': on_success, 'error': on_error, 'progress': on_progress, 'cancelled': on_cancel}
+
+        if self.on_busy_change:
+            self.on_busy_change(True)
+        worker = threading.Thread(target=self._run, args=(func, context, self._queue), daemon=True)
+        worker.start()
+        self.master.after(self.poll_interval_ms, self._poll, self._queue, callbacks)
+        return True
+
+    def cancel(self):
+        """Yêu cầu hủy tác vụ đang chạy (nếu có)."""
+        if self._cancel_event is not None:
+            self._cancel_event.set()
+
+    @staticmethod
+    def _run(func, context, job_queue):
+        try:
+            result = func(context)
+            context.check_cancelled()
+            job_queue.put(('done', result))
+        except JobCancelled:
+            job_queue.put(('cancelled', None))
+        except Exception as e:
+            job_queue.put(('error', e))
+
+    def _poll(self, job_queue, callbacks):
+        finished = None
+        try:
+            while finished is None:
+                kind, payload = job_queue.get_nowait()
+                if kind == 'progress':
+                    if callbacks['progress']:
+                        callbacks['progress'](payload)
+                else:
+                    finished = (kind, payload)
+        except queue.Empty:
+            pass
+
+        if finished is None:
+            self.master.after(self.poll_interval_ms, self._poll, job_queue, callbacks)
+            return
+
+        # Giải phóng runner trước khi gọi callback để callback có thể gửi tác vụ tiếp theo
+        self._queue = None
+        self._cancel_event = None
+        if self.on_busy_change:
+            self.on_busy_change(False)
+
+        kind, payload = finished
+        callback = callbacks[kind]
+        if kind == 'done':
+            callback(payload)
+        elif kind == 'error':
+            if callback:
+                callback(payload)
+            else:
+                print(f"Lỗi trong tác vụ nền: {payload}")
+        elif callback:
+            callback()
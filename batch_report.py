@@ -0,0 +1,207 @@
+import argparse
+import datetime
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import core_logic
+import instrumentation
+import shared_frame
+
+# Chế độ chạy hàng loạt không cần giao diện: nạp template MỘT lần rồi tạo mọi báo cáo trong manifest.
+# Manifest là file JSON, ví dụ:
+# {
+#   "template": "Time_report.xlsm",   (hoặc một thư mục / mẫu glob: mọi workbook được nạp và gộp;
+#                                      hoặc cơ sở dữ liệu SQLite .db tạo bởi "python data_source.py import")
+#   "output_dir": "month_end",
+#   "logo": "triac_logo.png",
+#   "reports": [
+#     {"name": "Alice", "type": "standard", "formats": ["excel", "pdf"],
+#      "year": 2024, "months": ["March"], "projects": ["P001", "P002"]},
+#     {"name": "Alice_compare", "type": "comparison", "formats": ["pdf"],
+#      "comparison_mode": "Compare Projects in a Month", "years": [2024], "months": ["March"], "projects": ["P001", "P002"]}
+#   ]
+# }
+# Báo cáo standard bỏ trống mode/year/months/projects sẽ lấy theo các sheet Config của template.
+# Chạy: python batch_report.py manifest.json [--workers 4]
+# Workbook quá lớn so với bộ nhớ: thêm --streaming để chỉ giữ dữ liệu tổng hợp (Excel không có dữ liệu chi tiết).
+# Với cơ sở dữ liệu SQLite, --streaming lấy khối tổng hợp bằng GROUP BY trong SQL.
+
+REPORT_FORMATS = ('excel', 'pdf')
+
+def load_manifest(manifest_path):
+    """Đọc manifest JSON. Đường dẫn tương đối trong manifest được tính theo thư mục chứa manifest."""
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if not isinstance(manifest.get('reports'), list) or not manifest['reports']:
+        raise ValueError("Manifest phải có danh sách 'reports' không rỗng.")
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    for key in ('template', 'output_dir', 'logo'):
+        if manifest.get(key):
+            manifest[key] = os.path.join(base_dir, manifest[key])
+    return manifest
+
+def _standard_config(report, template_config):
+    """Cấu hình báo cáo standard: các khóa có trong manifest ghi đè cấu hình đọc từ template."""
+    config = template_config.copy()
+    for key in ('mode', 'year', 'months'):
+        if key in report:
+            config[key] = report[key]
+
+    if 'projects' in report:
+        projects = list(report['projects'])
+    else:
+        # Giống giao diện: mặc định chọn các dự án có Include = yes trong Config_Project_Filter
+        project_filter_df = template_config['project_filter_df']
+        if 'Include' in project_filter_df.columns:
+            project_filter_df = project_filter_df[project_filter_df['Include'] == 'yes']
+        projects = project_filter_df['Project Name'].tolist() if 'Project Name' in project_filter_df.columns else []
+    config['project_filter_df'] = pd.DataFrame({'Project Name': projects, 'Include': ['yes'] * len(projects)})
+    return config
+
+def _comparison_config(report):
+    return {
+        'years': list(report.get('years', [])),
+        'months': list(report.get('months', [])),
+        'selected_projects': list(report.get('projects', [])),
+    }
+
+def build_export_tasks(manifest, config, report_data, output_dir, logo_path, chart_workers=None):
+    """
+    Lọc dữ liệu cho từng báo cáo (dùng chung khung và chỉ mục đã nạp; với cơ sở dữ liệu SQLite, hàng chi tiết
+    được truy vấn cho từng báo cáo, xem core_logic.standard_report_frames) và trả về danh sách
+    (tên file đầu ra, tên hàm export trong core_logic, tham số). Báo cáo không có dữ liệu bị bỏ qua kèm cảnh báo.
+    """
+    today = datetime.datetime.today().strftime('%Y%m%d')
+    tasks = []
+    for position, report in enumerate(manifest['reports'], start=1):
+        name = core_logic.sanitize_filename(report.get('name') or f"report_{position}")
+        report_type = report.get('type', 'standard')
+        formats = [fmt for fmt in report.get('formats', REPORT_FORMATS) if fmt in REPORT_FORMATS]
+        vector_charts = bool(report.get('vector_charts', False))
+
+        if report_type == 'standard':
+            run_config = _standard_config(report, config)
+            df_filtered, df_aggregates, include_raw_data = core_logic.standard_report_frames(report_data, run_config)
+            if df_filtered.empty:
+                print(f"Cảnh báo: Báo cáo '{name}' không có dữ liệu sau khi lọc, bỏ qua.")
+                continue
+            if 'excel' in formats:
+                output_path = os.path.join(output_dir, f"{name}_Standard_{today}.xlsx")
+                tasks.append((output_path, 'export_report', (df_filtered, run_config, output_path, df_aggregates, None, include_raw_data)))
+            if 'pdf' in formats:
+                output_path = os.path.join(output_dir, f"{name}_Standard_{today}.pdf")
+                tasks.append((output_path, 'export_pdf_report', (df_aggregates, run_config, output_path, logo_path, chart_workers, vector_charts)))
+
+        elif report_type == 'comparison':
+            comparison_mode = report.get('comparison_mode', "Compare Projects in a Month")
+            comparison_config = _comparison_config(report)
+            df_comparison, message = core_logic.comparison_results(
+                report_data['df_cube_month'], comparison_config, comparison_mode, report_data['cube_month_index'], report_data['data_version'])
+            if df_comparison.empty:
+                print(f"Cảnh báo: Báo cáo so sánh '{name}' không có dữ liệu. {message}")
+                continue
+            if 'excel' in formats:
+                output_path = os.path.join(output_dir, f"{name}_Comparison_{today}.xlsx")
+                tasks.append((output_path, 'export_comparison_report', (df_comparison, comparison_config, output_path, comparison_mode)))
+            if 'pdf' in formats:
+                output_path = os.path.join(output_dir, f"{name}_Comparison_{today}.pdf")
+                tasks.append((output_path, 'export_comparison_pdf_report', (df_comparison, comparison_config, output_path, comparison_mode, logo_path, vector_charts)))
+
+        else:
+            print(f"Cảnh báo: Loại báo cáo không hợp lệ '{report_type}' cho '{name}', bỏ qua.")
+    return tasks
+
+def share_raw_rows(tasks, df_raw, key='batch_raw'):
+    """
+    Chia sẻ df_raw một lần (shared_frame.publish_frame) và thay các khung con của df_raw trong tham số của
+    tasks bằng vị trí hàng (shared_frame.SharedRows): process con đọc các hàng từ vùng nhớ chia sẻ thay vì
+    nhận bản pickle. Cần index của df_raw không trùng; ngược lại tasks được giữ nguyên. Trả về tasks mới.
+    """
+    if not df_raw.index.is_unique:
+        return tasks
+    handle = shared_frame.publish_frame(df_raw, key)
+
+    def shared_arg(arg):
+        if not isinstance(arg, pd.DataFrame) or arg.empty or not arg.columns.equals(df_raw.columns):
+            return arg
+        positions = df_raw.index.get_indexer(arg.index)
+        return arg if (positions < 0).any() else shared_frame.SharedRows(handle, positions)
+
+    return [(output_path, export_name, tuple(shared_arg(arg) for arg in args)) for output_path, export_name, args in tasks]
+
+def _run_export_task(task):
+    """Chạy một task export (hàm cấp module để dùng được với ProcessPoolExecutor)."""
+    output_path, export_name, args = task
+    try:
+        args = [arg.load() if isinstance(arg, shared_frame.SharedRows) else arg for arg in args]
+        return output_path, bool(getattr(core_logic, export_name)(*args))
+    except Exception as e:
+        print(f"Lỗi khi tạo {output_path}: {e}")
+        return output_path, False
+
+def run_batch(manifest, template_file=None, output_dir=None, workers=1, use_cache=True, streaming=False):
+    """
+    Nạp template một lần, tạo toàn bộ báo cáo trong manifest. workers > 1 thì các file được xuất
+    song song trên nhiều process. streaming=True: nạp Raw Data theo lô vào khối tổng hợp
+    (core_logic.load_workbook_aggregates), bộ nhớ không phụ thuộc số hàng. Với cơ sở dữ liệu SQLite, dữ liệu
+    luôn được tổng hợp trong SQL (core_logic.load_report_data). Trả về danh sách (đường dẫn, thành công).
+    """
+    template_file = template_file or manifest.get('template') or core_logic.setup_paths()['template_file']
+    output_dir = output_dir or manifest.get('output_dir') or os.getcwd()
+    logo_path = manifest.get('logo') or core_logic.setup_paths()['logo_path']
+    os.makedirs(output_dir, exist_ok=True)
+
+    report_data = core_logic.load_report_data(template_file, use_cache=use_cache, aggregated=streaming)
+    if report_data['df_raw'].empty:
+        print(f"Lỗi: Không có dữ liệu Raw Data trong {template_file}.")
+        return []
+    config = report_data['config']
+
+    # Khi đã song song theo báo cáo thì mỗi process vẽ biểu đồ tuần tự, tránh lồng pool trong pool
+    chart_workers = 1 if workers > 1 else None
+    tasks = build_export_tasks(manifest, config, report_data, output_dir, logo_path, chart_workers)
+
+    if workers > 1 and len(tasks) > 1:
+        # Dữ liệu thô được chia sẻ một lần cho mọi process thay vì pickle các hàng đã lọc vào từng task
+        tasks = share_raw_rows(tasks, report_data['df_raw'])
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(_run_export_task, tasks))
+        finally:
+            shared_frame.release_frames('batch_raw')
+    return [_run_export_task(task) for task in tasks]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tạo hàng loạt báo cáo Time Report từ một manifest JSON, không cần giao diện.")
+    parser.add_argument('manifest', help="Đường dẫn file manifest JSON")
+    parser.add_argument('--template', help="File template (ghi đè 'template' trong manifest)")
+    parser.add_argument('--output-dir', help="Thư mục đầu ra (ghi đè 'output_dir' trong manifest)")
+    parser.add_argument('--workers', type=int, default=1, help="Số process xuất báo cáo song song (mặc định 1)")
+    parser.add_argument('--no-cache', action='store_true', help="Không dùng cache dữ liệu trên đĩa")
+    parser.add_argument('--streaming', action='store_true', help="Nạp Raw Data theo lô, chỉ giữ dữ liệu tổng hợp (workbook rất lớn)")
+    parser.add_argument('--trace-log', help="Ghi thời gian/bộ nhớ từng bước ra file JSON lines")
+    args = parser.parse_args(argv)
+
+    if args.trace_log:
+        os.environ[instrumentation.TRACE_LOG_ENV] = args.trace_log # Để các process con (spawn) cũng ghi log
+        instrumentation.enable_json_log(args.trace_log)
+
+    try:
+        manifest = load_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        print(f"Lỗi khi đọc manifest: {e}")
+        return 2
+
+    results = run_batch(manifest, args.template, args.output_dir, max(1, args.workers), not args.no_cache, args.streaming)
+    failed = [path for path, success in results if not success]
+    print(f"Đã tạo {len(results) - len(failed)}/{len(results)} báo cáo.")
+    for path in failed:
+        print(f"  Thất bại: {path}")
+    return 1 if failed or not results else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
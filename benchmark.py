@@ -0,0 +1,378 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+import core_logic
+import data_source
+
+# Đo hiệu năng các hàm chính của core_logic trên workbook tổng hợp có kích thước tùy chỉnh.
+# Workbook được sinh xác định (cùng seed -> cùng dữ liệu) với bố cục giống Time_report.xlsm:
+# Raw Data, Config_Year_Mode, Config_Project_Filter.
+# Kết quả (thời gian, bộ nhớ đỉnh) được ghi ra JSON để so sánh giữa các commit:
+#   python benchmark.py --rows 100000 --output bench_new.json --compare bench_old.json
+# Kiểm tra thời gian khởi động (thoát với mã 1 nếu vượt ngân sách hoặc import sớm module nặng; chạy tự động
+# trong tests/test_startup.py):
+#   python benchmark.py --check-startup
+# Đối chiếu và đo chuẩn hóa cột ngày (bảng lịch) với cách cũ trên N hàng (thoát với mã 1 nếu khác kết quả):
+#   python benchmark.py --date-rows 1000000
+# So sánh bộ nhớ và tốc độ lọc/tổng hợp của dữ liệu thô dạng gọn (core_logic.compact_raw_frame) với dạng thường:
+#   python benchmark.py --compact-rows 1000000 --projects 300 --years 7
+# Thời gian chia dữ liệu theo dự án (lọc từng dự án như cũ / chia một lần) và export_report theo số dự án:
+#   python benchmark.py --project-counts 50,300,1000 --rows 20000
+
+RAW_DATA_HEADER = ['Date', 'Team member', 'Project Name', 'Task', 'Workcentre', 'Hou ']
+HOUR_CHOICES = [0.5, 1, 1.5, 2, 2.5, 3, 4, 6, 8]
+
+# Ngân sách import (giây, lấy lần nhanh nhất trong vài lần chạy ở process mới) và các module
+# KHÔNG được import khi nạp module đó: chúng chỉ được import khi thật sự xuất PDF/nạp dữ liệu.
+STARTUP_BUDGETS = {
+    'app_interface': (0.5, ('pandas', 'openpyxl', 'matplotlib', 'fpdf')),
+    'core_logic': (2.0, ('matplotlib', 'fpdf')),
+}
+STARTUP_RUNS = 3
+_IMPORT_PROBE = (
+    "import json, sys, time\n"
+    "start = time.perf_counter()\n"
+    "import {module}\n"
+    "seconds = time.perf_counter() - start\n"
+    "print(json.dumps({{'seconds': seconds, 'modules': sorted(sys.modules)}}))\n"
+)
+
+def generate_workbook(path, rows=10000, projects=20, tasks=10, years=2, employees=30, workcentres=5, start_year=2023, seed=0):
+    """Sinh workbook Time Report tổng hợp, xác định theo seed. Trả về path."""
+    rng = random.Random(seed)
+    project_names = [f"P{i:04d} Project {i}" for i in range(projects)]
+    task_names = [f"Task {i}" for i in range(tasks)]
+    employee_names = [f"Employee {i}" for i in range(employees)]
+    workcentre_names = [f"WC{i}" for i in range(workcentres)]
+    first_day = datetime.datetime(start_year, 1, 1)
+    n_days = (datetime.datetime(start_year + years, 1, 1) - first_day).days
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Raw Data')
+    ws.append(RAW_DATA_HEADER)
+    for _ in range(rows):
+        ws.append([
+            first_day + datetime.timedelta(days=rng.randrange(n_days)),
+            rng.choice(employee_names),
+            rng.choice(project_names),
+            rng.choice(task_names),
+            rng.choice(workcentre_names),
+            rng.choice(HOUR_CHOICES),
+        ])
+
+    ws = wb.create_sheet('Config_Year_Mode')
+    ws.append(['Key', 'Value'])
+    ws.append(['Mode', 'month'])
+    ws.append(['Year', start_year])
+    ws.append(['Months', 'January, February, March'])
+
+    ws = wb.create_sheet('Config_Project_Filter')
+    ws.append(['Project Name', 'Include'])
+    for position, project in enumerate(project_names):
+        ws.append([project, 'Yes' if position % 2 == 0 else 'No'])
+
+    wb.save(path)
+    return path
+
+def measure(name, func, track_memory=True):
+    """Chạy func() một lần, trả về (kết quả, bản ghi đo gồm thời gian và bộ nhớ Python cấp phát đỉnh)."""
+    if track_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func()
+    finally:
+        seconds = time.perf_counter() - start
+        peak_bytes = tracemalloc.get_traced_memory()[1] if track_memory else None
+        if track_memory:
+            tracemalloc.stop()
+    record = {'name': name, 'seconds': round(seconds, 4), 'peak_mb': round(peak_bytes / 1024 / 1024, 2) if peak_bytes is not None else None}
+    print(f"{name:<32} {seconds:9.3f} s" + (f" {record['peak_mb']:10.1f} MB" if peak_bytes is not None else ""))
+    return result, record
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(template_file, output_dir, logo_path, track_memory=True):
+    """Đo lần lượt từng hàm của core_logic trên template_file; các file báo cáo được ghi vào output_dir."""
+    records = []
+
+    def timed(name, func):
+        result, record = measure(name, func, track_memory)
+        records.append(record)
+        return result
+
+    config = core_logic.read_configs(template_file)
+    df_raw = timed('load_raw_data', lambda: core_logic.load_raw_data(template_file))
+    records[-1]['rows'] = len(df_raw)
+
+    project_filter_df = config['project_filter_df']
+    selected = project_filter_df.loc[project_filter_df['Include'] == 'yes', 'Project Name'].tolist()
+    run_config = dict(config, project_filter_df=pd.DataFrame({'Project Name': selected, 'Include': ['yes'] * len(selected)}))
+    df_filtered = timed('apply_filters', lambda: core_logic.apply_filters(df_raw, run_config))
+    records[-1]['rows'] = len(df_filtered)
+    df_pushdown = timed('load_raw_data_pushdown', lambda: core_logic.load_raw_data(template_file, run_config))
+    records[-1]['rows'] = len(df_pushdown)
+
+    comparison_mode = "Compare Projects in a Month"
+    comparison_config = {'years': [config['year']], 'months': config['months'][:1], 'selected_projects': selected}
+    df_comparison, _ = timed('apply_comparison_filters', lambda: core_logic.apply_comparison_filters(df_raw, comparison_config, comparison_mode))
+    records[-1]['rows'] = len(df_comparison)
+
+    exports = [
+        ('export_report', lambda: core_logic.export_report(df_filtered, run_config, os.path.join(output_dir, 'bench_standard.xlsx'))),
+        ('export_pdf_report', lambda: core_logic.export_pdf_report(df_filtered, run_config, os.path.join(output_dir, 'bench_standard.pdf'), logo_path)),
+        ('export_comparison_report', lambda: core_logic.export_comparison_report(df_comparison, comparison_config, os.path.join(output_dir, 'bench_comparison.xlsx'), comparison_mode)),
+        ('export_comparison_pdf_report', lambda: core_logic.export_comparison_pdf_report(df_comparison, comparison_config, os.path.join(output_dir, 'bench_comparison.pdf'), comparison_mode, logo_path)),
+    ]
+    for name, func in exports:
+        success = timed(name, func)
+        records[-1]['ok'] = bool(success)
+    return records
+
+def measure_import(module, runs=STARTUP_RUNS):
+    """Import module trong process Python mới; trả về (thời gian nhanh nhất, các module đã được nạp)."""
+    best_seconds, modules = None, []
+    for _ in range(runs):
+        completed = subprocess.run([sys.executable, '-c', _IMPORT_PROBE.format(module=module)], capture_output=True,
+                                   text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        probe = json.loads(completed.stdout.strip().splitlines()[-1])
+        if best_seconds is None or probe['seconds'] < best_seconds:
+            best_seconds, modules = probe['seconds'], probe['modules']
+    return best_seconds, modules
+
+def check_startup(budget_scale=1.0):
+    """Kiểm tra ngân sách import của giao diện và core_logic. Trả về danh sách lỗi (rỗng nếu đạt)."""
+    failures = []
+    for module, (budget, deferred_modules) in STARTUP_BUDGETS.items():
+        seconds, modules = measure_import(module)
+        budget *= budget_scale
+        print(f"import {module:<16} {seconds:7.3f} s (ngân sách {budget:.2f} s)")
+        if seconds > budget:
+            failures.append(f"import {module} mất {seconds:.3f} s, vượt ngân sách {budget:.2f} s")
+        for heavy in deferred_modules:
+            if heavy in modules:
+                failures.append(f"import {module} đã import sớm '{heavy}'")
+    for failure in failures:
+        print(f"THẤT BẠI: {failure}")
+    return failures
+
+def legacy_date_columns(df):
+    """Chuẩn hóa cột ngày theo cách cũ (suy luận định dạng, month_name/isocalendar trên từng hàng), làm chuẩn đối chiếu."""
+    df = df.copy()
+    df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+    df = df.dropna(subset=['Date'])
+    df['Year'] = df['Date'].dt.year
+    df['MonthName'] = df['Date'].dt.month_name()
+    df['Week'] = df['Date'].dt.isocalendar().week.astype(int)
+    return df
+
+def calendar_date_columns(df):
+    """Chuẩn hóa cột ngày như data_source._normalize_raw_data hiện tại."""
+    df = df.copy()
+    df['Date'] = data_source._parse_dates(df['Date'])
+    df = df.dropna(subset=['Date'])
+    years, month_names, weeks = data_source._calendar_columns(df['Date'])
+    return df.assign(Year=years, MonthName=month_names, Week=weeks)
+
+def date_samples(rows, years=7, seed=0):
+    """Các cột Date mẫu như khi đọc từ openpyxl: toàn datetime, có vài ô nhập sai, và ngày dạng chuỗi."""
+    rng = np.random.default_rng(seed)
+    first_day = np.datetime64('2018-01-01')
+    dates = (first_day + rng.integers(0, 365 * years, rows).astype('timedelta64[D]')).astype('datetime64[us]')
+    datetimes = dates.astype(object)
+    mixed = datetimes.copy()
+    mixed[::10000] = 'n/a'
+    strings = pd.Series(dates).dt.strftime('%Y-%m-%d').to_numpy(dtype=object)
+    return {'datetime': datetimes, 'mixed': mixed, 'strings': strings}
+
+def benchmark_date_normalization(rows, seed=0):
+    """Đo và đối chiếu chuẩn hóa ngày cũ/mới trên từng loại cột mẫu. Trả về danh sách lỗi (rỗng nếu khớp)."""
+    failures = []
+    for kind, values in date_samples(rows, seed=seed).items():
+        df = pd.DataFrame({'Date': pd.Series(list(values)), 'Hours': 1.0})
+        legacy, legacy_record = measure(f"dates[{kind}] legacy", lambda: legacy_date_columns(df), track_memory=False)
+        current, current_record = measure(f"dates[{kind}] calendar", lambda: calendar_date_columns(df), track_memory=False)
+        print(f"{'':<32} x{legacy_record['seconds'] / max(current_record['seconds'], 1e-9):.1f} nhanh hơn")
+        for col in ('Date', 'Year', 'MonthName', 'Week'):
+            if not legacy[col].reset_index(drop=True).equals(current[col].reset_index(drop=True)):
+                failures.append(f"Cột {col} khác kết quả cũ với dữ liệu '{kind}'")
+    for failure in failures:
+        print(f"THẤT BẠI: {failure}")
+    return failures
+
+def raw_frame_sample(rows, projects=20, tasks=10, years=2, employees=30, workcentres=5, start_year=2023, seed=0):
+    """Khung dữ liệu thô đã chuẩn hóa (như core_logic.load_raw_data trả về) sinh ngẫu nhiên, không qua workbook."""
+    rng = np.random.default_rng(seed)
+    first_day = np.datetime64(f'{start_year}-01-01')
+    dates = pd.Series((first_day + rng.integers(0, 365 * years, rows).astype('timedelta64[D]')).astype('datetime64[us]'))
+    def names(prefix, count):
+        return pd.Series(np.array([f"{prefix} {i}" for i in range(count)], dtype=object)[rng.integers(0, count, rows)], dtype='str')
+    years_col, month_names, weeks = data_source._calendar_columns(dates)
+    return pd.DataFrame({
+        'Date': dates,
+        'Employee': names('Employee', employees),
+        'Project name': names('Project', projects),
+        'Task': names('Task', tasks),
+        'Workcentre': names('WC', workcentres),
+        'Hours': np.array(HOUR_CHOICES, dtype=float)[rng.integers(0, len(HOUR_CHOICES), rows)],
+        'Year': years_col,
+        'MonthName': pd.Series(month_names, dtype='str'),
+        'Week': weeks,
+    })
+
+def _numeric_total(df):
+    """Tổng mọi ô số của một bảng kết quả, để đối chiếu hai cách tính."""
+    return float(df.select_dtypes('number').to_numpy().sum()) if not df.empty else 0.0
+
+def benchmark_compact_frame(rows, projects=20, tasks=10, years=2, seed=0):
+    """
+    Đo bộ nhớ và các truy vấn chính trên dữ liệu thô dạng thường và dạng gọn, đối chiếu tổng Hours.
+    Trả về danh sách lỗi (rỗng nếu hai dạng cho cùng kết quả).
+    """
+    df = raw_frame_sample(rows, projects, tasks, years, seed=seed)
+    df_compact, _ = measure('compact_raw_frame', lambda: core_logic.compact_raw_frame(df), track_memory=False)
+    for label, frame in (('thường', df), ('gọn', df_compact)):
+        print(f"{'memory_deep[' + label + ']':<32} {frame.memory_usage(deep=True).sum() / 1024 / 1024:9.1f} MB")
+
+    project_names = sorted(df['Project name'].unique().tolist())
+    selected = project_names[::2]
+    start_year = int(df['Year'].min())
+    config = {'mode': 'month', 'year': start_year, 'months': ['January', 'February', 'March'],
+              'project_filter_df': pd.DataFrame({'Project Name': selected, 'Include': ['yes'] * len(selected)})}
+    comparison_mode = "Compare Projects in a Year"
+    comparison_config = {'years': [start_year], 'months': [], 'selected_projects': selected[:10]}
+    queries = [
+        ('apply_filters', lambda frame: core_logic.apply_filters(frame, config)['Hours'].sum()),
+        ('apply_comparison_filters', lambda frame: _numeric_total(core_logic.apply_comparison_filters(frame, comparison_config, comparison_mode)[0])),
+        ('groupby_year_month_project', lambda frame: frame.groupby(['Year', 'MonthName', 'Project name'], observed=True)['Hours'].sum().sum()),
+    ]
+    failures = []
+    for name, query in queries:
+        normal, normal_record = measure(f"{name}[thường]", lambda: query(df), track_memory=False)
+        compact, compact_record = measure(f"{name}[gọn]", lambda: query(df_compact), track_memory=False)
+        print(f"{'':<32} x{normal_record['seconds'] / max(compact_record['seconds'], 1e-9):.1f} nhanh hơn")
+        if not np.isclose(normal, compact):
+            failures.append(f"{name}: dạng gọn cho {compact}, dạng thường cho {normal}")
+    for failure in failures:
+        print(f"THẤT BẠI: {failure}")
+    return failures
+
+def legacy_project_partitions(df):
+    """Chia theo dự án như cách cũ: so sánh toàn cột Project name cho từng dự án."""
+    return [(project, df[df['Project name'] == project]) for project in df['Project name'].dropna().unique()]
+
+def project_task_totals(partitions):
+    """Tổng Hours theo Task của từng dự án (phần việc mỗi sheet dự án làm sau khi chia)."""
+    return {project: df_proj.groupby('Task', observed=True)['Hours'].sum().to_dict() for project, df_proj in partitions}
+
+def benchmark_project_partition(rows, project_counts, tasks=10, years=2, seed=0):
+    """
+    Với mỗi số dự án: đo chia dữ liệu theo dự án (cách cũ và core_logic._partition_by_project, kèm groupby Task
+    của từng dự án) rồi export_report. Trả về danh sách lỗi (rỗng nếu hai cách chia cho cùng kết quả).
+    """
+    failures = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for projects in project_counts:
+            print(f"{projects} dự án, {rows} hàng:")
+            df = raw_frame_sample(rows, projects, tasks, years, seed=seed)
+            legacy, legacy_record = measure(f"partition[{projects}] per-project scan",
+                                            lambda: project_task_totals(legacy_project_partitions(df)), track_memory=False)
+            current, current_record = measure(f"partition[{projects}] partition once",
+                                              lambda: project_task_totals(core_logic._partition_by_project(df)), track_memory=False)
+            print(f"{'':<32} x{legacy_record['seconds'] / max(current_record['seconds'], 1e-9):.1f} nhanh hơn")
+            if legacy != current:
+                failures.append(f"Chia theo {projects} dự án khác kết quả cách cũ")
+
+            config = {'mode': 'month', 'year': int(df['Year'].min()), 'months': [], 'project_filter_df': pd.DataFrame()}
+            output_path = os.path.join(work_dir, f'bench_projects_{projects}.xlsx')
+            success, _ = measure(f"export_report[{projects}]", lambda: core_logic.export_report(df, config, output_path), track_memory=False)
+            if not success:
+                failures.append(f"export_report thất bại với {projects} dự án")
+    for failure in failures:
+        print(f"THẤT BẠI: {failure}")
+    return failures
+
+def compare_results(current, previous_path):
+    """In tỉ lệ thời gian so với một file kết quả trước đó (> 1 là chậm hơn)."""
+    with open(previous_path, 'r', encoding='utf-8') as f:
+        previous_results = json.load(f)
+    previous = {record['name']: record for record in previous_results['results']}
+    print(f"\nSo với {previous_path} (commit {previous_results.get('commit')}):")
+    for record in current:
+        old = previous.get(record['name'])
+        if old and old['seconds']:
+            print(f"{record['name']:<32} {old['seconds']:9.3f} s -> {record['seconds']:9.3f} s  (x{record['seconds'] / old['seconds']:.2f})")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark các hàm của core_logic trên workbook tổng hợp.")
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--projects', type=int, default=20)
+    parser.add_argument('--tasks', type=int, default=10)
+    parser.add_argument('--years', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--template', help="Dùng workbook có sẵn thay vì sinh workbook tổng hợp")
+    parser.add_argument('--output', default='benchmark_results.json', help="File JSON ghi kết quả")
+    parser.add_argument('--compare', help="File JSON kết quả trước đó để so sánh")
+    parser.add_argument('--no-memory', action='store_true', help="Không đo bộ nhớ (tracemalloc làm chậm các bước thuần Python)")
+    parser.add_argument('--check-startup', action='store_true', help="Chỉ kiểm tra ngân sách thời gian import khi khởi động")
+    parser.add_argument('--budget-scale', type=float, default=1.0, help="Nhân ngân sách import (cho máy chậm)")
+    parser.add_argument('--date-rows', type=int, help="Chỉ đối chiếu và đo chuẩn hóa cột ngày trên số hàng này")
+    parser.add_argument('--compact-rows', type=int, help="Chỉ so sánh dữ liệu thô dạng gọn với dạng thường trên số hàng này")
+    parser.add_argument('--project-counts', help="Chỉ đo chia dữ liệu theo dự án và export_report với các số dự án này (ví dụ 50,300,1000), trên --rows hàng")
+    args = parser.parse_args(argv)
+
+    if args.check_startup:
+        return 1 if check_startup(args.budget_scale) else 0
+    if args.date_rows:
+        return 1 if benchmark_date_normalization(args.date_rows, args.seed) else 0
+    if args.compact_rows:
+        return 1 if benchmark_compact_frame(args.compact_rows, args.projects, args.tasks, args.years, args.seed) else 0
+    if args.project_counts:
+        project_counts = [int(count) for count in args.project_counts.split(',') if count.strip()]
+        return 1 if benchmark_project_partition(args.rows, project_counts, args.tasks, args.years, args.seed) else 0
+
+    logo_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), core_logic.setup_paths()['logo_path'])
+    with tempfile.TemporaryDirectory() as work_dir:
+        template_file = args.template
+        if not template_file:
+            template_file = os.path.join(work_dir, 'Time_report_bench.xlsx')
+            print(f"Sinh workbook {args.rows} hàng, {args.projects} dự án, {args.tasks} task, {args.years} năm...")
+            generate_workbook(template_file, args.rows, args.projects, args.tasks, args.years, seed=args.seed)
+        records = run_benchmarks(template_file, work_dir, logo_path, track_memory=not args.no_memory)
+
+    results = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'params': {'template': args.template, 'rows': args.rows, 'projects': args.projects, 'tasks': args.tasks,
+                   'years': args.years, 'seed': args.seed, 'track_memory': not args.no_memory},
+        'results': records,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Đã ghi kết quả vào {args.output}")
+
+    if args.compare:
+        compare_results(records, args.compare)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
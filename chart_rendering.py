@@ -0,0 +1,144 @@
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Vẽ biểu đồ cho báo cáo PDF, có thể song song trên nhiều process.
+# Mỗi process áp dụng kiểu biểu đồ (rcParams, font) một lần và dùng lại cùng một figure cho mọi biểu đồ.
+# Module này cố ý không import pandas và chỉ import matplotlib bên trong hàm vẽ,
+# để các process con (spawn trên Windows) khởi động nhanh.
+
+CHART_RC_PARAMS = {
+    'font.family': 'sans-serif',
+    'font.sans-serif': ['Arial', 'Helvetica', 'Liberation Sans'],
+    'axes.unicode_minus': False,
+}
+MIN_JOBS_FOR_POOL = 8 # Ít biểu đồ hơn thì chi phí khởi động process lớn hơn lợi ích
+
+# Lề cố định (inch) thay cho tight_layout; riêng lề trái được tính theo nhãn trục y dài nhất.
+MARGIN_RIGHT_IN = 0.3
+MARGIN_TOP_IN = 0.45
+MARGIN_BOTTOM_IN = 0.6
+YLABEL_SPACE_IN = 0.45 # Nhãn trục y + khoảng cách từ vạch chia đến nhãn
+MAX_LEFT_FRACTION = 0.6
+TICK_LABEL_SIZE = 8
+
+_style_applied = False
+_chart_font_path = None
+_figures = {} # figsize -> (fig, ax): mỗi process dùng lại một figure cho mọi biểu đồ cùng kích thước
+_figure_lock = threading.Lock()
+
+def apply_chart_style():
+    """
+    Áp dụng rcParams cho biểu đồ MỘT lần trong mỗi process, với họ font đầu tiên thực sự có trên máy
+    (tránh để matplotlib dò lại danh sách font và cảnh báo thiếu Arial ở mỗi biểu đồ).
+    """
+    global _style_applied, _chart_font_path
+    if _style_applied:
+        return
+    import matplotlib
+    from matplotlib import font_manager
+
+    rc_params = dict(CHART_RC_PARAMS)
+    for family in CHART_RC_PARAMS['font.sans-serif']:
+        try:
+            _chart_font_path = font_manager.findfont(font_manager.FontProperties(family=[family]), fallback_to_default=False)
+        except ValueError:
+            continue
+        rc_params['font.sans-serif'] = [family]
+        break
+    else:
+        _chart_font_path = font_manager.findfont(font_manager.FontProperties(family=['sans-serif']))
+        rc_params['font.sans-serif'] = [font_manager.FontProperties(fname=_chart_font_path).get_name()]
+    matplotlib.rcParams.update(rc_params)
+    _style_applied = True
+
+def _label_width_inches(labels, fontsize):
+    """Chiều rộng (inch) của nhãn dài nhất, đo bằng font đã tra cứu (không cần renderer như tight_layout)."""
+    if not labels:
+        return 0.0
+    from matplotlib.font_manager import get_font
+
+    font = get_font(_chart_font_path) # get_font được cache theo đường dẫn
+    font.set_size(fontsize, 72) # 72 dpi: 1 pixel = 1 point
+    widest = 0
+    for label in labels:
+        font.set_text(label, 0.0)
+        widest = max(widest, font.get_width_height()[0])
+    return widest / 64 / 72 # Đơn vị 26.6 (1/64 pixel) -> point -> inch
+
+def _chart_axes(figsize):
+    """Figure + axes dùng lại cho mọi biểu đồ cùng kích thước; xóa nội dung cũ trước khi vẽ."""
+    entry = _figures.get(figsize)
+    if entry is None:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        fig = Figure(figsize=figsize)
+        FigureCanvasAgg(fig)
+        entry = _figures[figsize] = (fig, fig.add_subplot())
+    fig, ax = entry
+    ax.clear()
+    return fig, ax
+
+def figure_to_bytes(fig, image_format='png', dpi=150):
+    """Lưu figure vào bộ nhớ (PNG, hoặc SVG để nhúng vào PDF dạng vector) và trả về bytes."""
+    buffer = io.BytesIO()
+    if image_format == 'svg':
+        fig.savefig(buffer, format='svg', metadata={'Date': None}) # Bỏ ngày tạo để ảnh ổn định giữa các lần chạy
+    else:
+        fig.savefig(buffer, format=image_format, dpi=dpi)
+    return buffer.getvalue()
+
+def spec_chart_job(spec, image_format='png', dpi=150):
+    """Job vẽ ảnh matplotlib từ một đặc tả biểu đồ của chart_specs."""
+    job = dict(spec, image_format=image_format, dpi=dpi)
+    job['labels'] = [str(label) for label in spec['labels']]
+    return job
+
+def render_bar_chart(job):
+    """
+    Vẽ một biểu đồ cột ngang bằng backend Agg (dùng được trong process con) và trả về ảnh dạng bytes.
+    Giao diện giống Series.plot(kind='barh'): giá trị đầu tiên nằm dưới cùng.
+    """
+    apply_chart_style()
+    width, height = job['figsize']
+
+    with _figure_lock: # Figure và đối tượng font được cache dùng chung, chỉ vẽ một biểu đồ mỗi lúc
+        left_in = _label_width_inches(job['labels'], TICK_LABEL_SIZE) + YLABEL_SPACE_IN
+        fig, ax = _chart_axes(job['figsize'])
+        fig.subplots_adjust(
+            left=min(left_in / width, MAX_LEFT_FRACTION),
+            right=1 - MARGIN_RIGHT_IN / width,
+            top=1 - MARGIN_TOP_IN / height,
+            bottom=MARGIN_BOTTOM_IN / height,
+        )
+        positions = range(len(job['labels']))
+        ax.barh(positions, job['values'], height=0.5, color=job['color'])
+        ax.set_yticks(positions)
+        ax.set_yticklabels(job['labels'])
+        ax.set_ylim(-0.5, len(job['labels']) - 0.5)
+        ax.set_title(job['title'], fontsize=9)
+        ax.tick_params(axis='y', labelsize=TICK_LABEL_SIZE)
+        ax.set_xlabel(job['xlabel'])
+        ax.set_ylabel(job['ylabel'])
+        return figure_to_bytes(fig, job['image_format'], job['dpi'])
+
+def render_charts(jobs, workers=None):
+    """
+    Vẽ danh sách job, trả về kết quả theo ĐÚNG thứ tự của jobs.
+    workers: số process (None = số nhân CPU, 1 = vẽ tuần tự). Nếu pool lỗi, tự quay về vẽ tuần tự.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(jobs))
+
+    if workers > 1 and len(jobs) >= MIN_JOBS_FOR_POOL:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunksize = max(1, len(jobs) // (workers * 4))
+                return list(executor.map(render_bar_chart, jobs, chunksize=chunksize))
+        except Exception as e:
+            print(f"Cảnh báo: Không thể vẽ biểu đồ song song, chuyển sang vẽ tuần tự: {e}")
+
+    return [render_bar_chart(job) for job in jobs]
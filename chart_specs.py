@@ -0,0 +1,193 @@
+import functools
+import math
+import os
+import unicodedata
+
+from openpyxl.chart import BarChart, Reference
+
+# Đặc tả biểu đồ cột dùng chung cho báo cáo Excel và PDF: dữ liệu (nhãn, giá trị), tiêu đề và màu
+# được tính MỘT lần cho mỗi dự án, sau đó vẽ bằng một trong các backend:
+#   - add_excel_bar_chart: biểu đồ Excel gốc của openpyxl, tham chiếu bảng dữ liệu trên sheet
+#   - draw_pdf_bar_chart : vẽ trực tiếp lên trang PDF bằng các lệnh vector của fpdf (không cần matplotlib)
+#   - chart_rendering    : ảnh PNG/SVG qua matplotlib (chart_rendering.spec_chart_job)
+# Một spec là dict picklable: labels, values, title, xlabel, ylabel, color, figsize (tỉ lệ khung, inch).
+
+PROJECT_CHART_DIMENSIONS = {
+    # chiều -> (màu, kích thước ảnh matplotlib tính bằng inch)
+    'Workcentre': ('skyblue', (10, 5)),
+    'Task': ('lightgreen', (10, 6)),
+}
+CHART_COLORS = {
+    'skyblue': (135, 206, 235),
+    'lightgreen': (144, 238, 144),
+    'teal': (0, 128, 128),
+    'purple': (128, 0, 128),
+    'red': (255, 0, 0),
+}
+PDF_UNICODE_FONT = 'ChartSans'
+UNICODE_FONT_CANDIDATES = (
+    os.path.join(os.environ.get('WINDIR', r'C:\Windows'), 'Fonts', 'arial.ttf'),
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf',
+    '/System/Library/Fonts/Supplemental/Arial.ttf',
+    '/Library/Fonts/Arial.ttf',
+)
+
+def bar_chart_spec(series, title, xlabel, ylabel, color, figsize=(10, 6)):
+    """Đặc tả biểu đồ cột ngang từ một Series đã tổng hợp (index là nhãn, giá trị là Hours)."""
+    return {
+        'labels': series.index.tolist(),
+        'values': [float(value) for value in series.values],
+        'title': title,
+        'xlabel': xlabel,
+        'ylabel': ylabel,
+        'color': color,
+        'figsize': tuple(figsize),
+    }
+
+def project_chart_specs(df, dimension):
+    """
+    Tổng Hours theo dự án × dimension với MỘT lần groupby, trả về {dự án: spec} (chỉ các dự án có dữ liệu).
+    Trong mỗi dự án, nhãn được xếp theo Hours giảm dần như biểu đồ cũ.
+    """
+    if df.empty or dimension not in df.columns or 'Project name' not in df.columns:
+        return {}
+    color, figsize = PROJECT_CHART_DIMENSIONS.get(dimension, ('skyblue', (10, 6)))
+    totals = df.groupby(['Project name', dimension], observed=True)['Hours'].sum()
+    specs = {}
+    for project, project_totals in totals.groupby(level=0, observed=True, sort=False):
+        series = project_totals.droplevel(0).sort_values(ascending=False)
+        if not series.empty:
+            specs[project] = bar_chart_spec(series, f"{project} - Hours by {dimension}", "Hours", dimension, color, figsize)
+    return specs
+
+def build_standard_chart_specs(df, dimensions=('Workcentre', 'Task')):
+    """
+    Đặc tả biểu đồ của báo cáo tiêu chuẩn: {'projects': [dự án theo thứ tự xuất hiện], chiều: {dự án: spec}}.
+    Tính một lần rồi dùng chung cho export_report và export_pdf_report.
+    """
+    specs = {'projects': df['Project name'].dropna().unique().tolist() if 'Project name' in df.columns else []}
+    for dimension in dimensions:
+        specs[dimension] = project_chart_specs(df, dimension)
+    return specs
+
+def add_excel_bar_chart(ws, spec, header_row, anchor):
+    """
+    Biểu đồ Excel gốc cho bảng [nhãn, giá trị] đã ghi ở cột A:B, tiêu đề bảng tại header_row.
+    """
+    n_rows = len(spec['labels'])
+    chart = BarChart()
+    chart.title = spec['title']
+    chart.x_axis.title = spec['ylabel'] # Biểu đồ cột đứng của Excel: nhãn nằm trên trục x
+    chart.y_axis.title = spec['xlabel']
+    chart.add_data(Reference(ws, min_col=2, min_row=header_row, max_row=header_row + n_rows), titles_from_data=True)
+    chart.set_categories(Reference(ws, min_col=1, min_row=header_row + 1, max_row=header_row + n_rows))
+    ws.add_chart(chart, anchor)
+    return chart
+
+@functools.lru_cache(maxsize=1)
+def _unicode_font_path():
+    """Font TrueType có dấu tiếng Việt trên máy (tra cứu một lần), hoặc None."""
+    for path in UNICODE_FONT_CANDIDATES:
+        if os.path.exists(path):
+            return path
+    return None
+
+def _pdf_chart_font(pdf):
+    """Họ font cho chữ trong biểu đồ: font Unicode nếu có, ngược lại font helvetica có sẵn của fpdf."""
+    font_path = _unicode_font_path()
+    if font_path is None:
+        return 'helvetica'
+    if PDF_UNICODE_FONT.lower() not in pdf.fonts:
+        pdf.add_font(PDF_UNICODE_FONT, '', font_path)
+    return PDF_UNICODE_FONT
+
+def _pdf_text(text, font):
+    """Font helvetica chỉ có ký tự Latin-1: bỏ dấu các ký tự còn lại (Thiết kế -> Thiet ke)."""
+    text = str(text)
+    if font != 'helvetica':
+        return text
+    text = text.replace('đ', 'd').replace('Đ', 'D')
+    text = ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+    return text.encode('latin-1', 'replace').decode('latin-1')
+
+def _nice_ticks(max_value, target_ticks=6):
+    """Các vạch chia 0, step, 2*step... với step tròn (1, 2, 2.5, 5 × 10^k)."""
+    if max_value <= 0:
+        return [0.0, 1.0]
+    raw_step = max_value / target_ticks
+    magnitude = 10 ** math.floor(math.log10(raw_step))
+    step = next(m * magnitude for m in (1, 2, 2.5, 5, 10) if m * magnitude >= raw_step)
+    return [i * step for i in range(int(max_value // step) + 1)]
+
+def _format_tick(value):
+    return f"{value:g}" if value == int(value) else f"{value:.1f}"
+
+def _fit_text(pdf, text, max_width):
+    if pdf.get_string_width(text) <= max_width:
+        return text
+    while text and pdf.get_string_width(text + '...') > max_width:
+        text = text[:-1]
+    return text + '...'
+
+def draw_pdf_bar_chart(pdf, spec, x, y, w, h):
+    """
+    Vẽ biểu đồ cột ngang của spec vào khung (x, y, w, h) (mm) trên trang PDF hiện tại bằng các lệnh
+    vector của fpdf. Bố cục giống ảnh matplotlib: giá trị đầu tiên nằm dưới cùng.
+    """
+    font = _pdf_chart_font(pdf)
+    labels = [_pdf_text(label, font) for label in spec['labels']]
+    values = [max(value, 0.0) for value in spec['values']]
+    mm_per_pt = 25.4 / 72
+
+    pdf.set_text_color(0, 0, 0)
+    pdf.set_font(font, '', 9)
+    title = _pdf_text(spec['title'], font)
+    pdf.text(x + (w - pdf.get_string_width(title)) / 2, y + 4, title)
+
+    pdf.set_font(font, '', 7)
+    ylabel_space = 7
+    label_width = min(max((pdf.get_string_width(label) for label in labels), default=0), w * 0.45)
+    plot_left = x + ylabel_space + label_width + 2.5
+    plot_right = x + w - 3
+    plot_top = y + 8
+    plot_bottom = y + h - 12
+    plot_width = plot_right - plot_left
+    plot_height = plot_bottom - plot_top
+
+    max_value = max(values, default=0.0)
+    axis_max = max_value * 1.05 if max_value > 0 else 1.0
+    ticks = [tick for tick in _nice_ticks(axis_max) if tick <= axis_max]
+
+    # Cột và nhãn trục y
+    slot = plot_height / max(len(values), 1)
+    text_offset = 7 * mm_per_pt * 0.35 # Canh giữa chữ theo chiều dọc (đường chân chữ)
+    red, green, blue = CHART_COLORS.get(spec['color'], CHART_COLORS['skyblue'])
+    pdf.set_fill_color(red, green, blue)
+    pdf.set_draw_color(0, 0, 0)
+    pdf.set_line_width(0.2)
+    for position, (label, value) in enumerate(zip(labels, values)):
+        center = plot_bottom - (position + 0.5) * slot
+        bar_width = plot_width * value / axis_max
+        if bar_width > 0:
+            pdf.rect(plot_left, center - slot * 0.25, bar_width, slot * 0.5, style='F')
+        pdf.line(plot_left - 1, center, plot_left, center)
+        label = _fit_text(pdf, label, label_width)
+        pdf.text(plot_left - 1.5 - pdf.get_string_width(label), center + text_offset, label)
+
+    # Khung và trục x
+    pdf.rect(plot_left, plot_top, plot_width, plot_height)
+    for tick in ticks:
+        tick_x = plot_left + plot_width * tick / axis_max
+        pdf.line(tick_x, plot_bottom, tick_x, plot_bottom + 1)
+        tick_label = _format_tick(tick)
+        pdf.text(tick_x - pdf.get_string_width(tick_label) / 2, plot_bottom + 4, tick_label)
+
+    pdf.set_font(font, '', 8)
+    xlabel = _pdf_text(spec['xlabel'], font)
+    pdf.text(plot_left + (plot_width - pdf.get_string_width(xlabel)) / 2, plot_bottom + 9, xlabel)
+    ylabel = _pdf_text(spec['ylabel'], font)
+    ylabel_x = x + 4
+    ylabel_y = plot_top + (plot_height + pdf.get_string_width(ylabel)) / 2
+    with pdf.rotation(90, ylabel_x, ylabel_y):
+        pdf.text(ylabel_x, ylabel_y, ylabel)
@@ -1,14 +1,39 @@
 import pandas as pd
+import numpy as np
 import datetime
 import os
-from openpyxl import load_workbook
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
 from openpyxl.chart import BarChart, Reference, LineChart
 from openpyxl.utils.dataframe import dataframe_to_rows
-from fpdf import FPDF
-from matplotlib import pyplot as plt
-import tempfile
+import io
 import re
-import shutil
+import itertools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import chart_rendering
+import chart_specs
+import data_source
+import instrumentation
+# Nạp, chuẩn hóa và lọc dữ liệu thô nằm ở tầng data_source; các tên dưới đây được giữ trong core_logic
+# để giao diện, batch và các script cũ vẫn dùng được.
+from data_source import (
+    REPORT_COLUMNS, MONTH_ORDER, CUBE_DIMENSIONS,
+    load_workbook_data, load_workbooks_data, load_workbook_aggregates, read_configs, load_raw_data,
+    invalidate_data_cache, resolve_workbook_paths, compact_raw_frame, build_aggregate_cube,
+    select_rows, apply_filters,
+)
+
+# matplotlib và fpdf chỉ được import trong các hàm xuất PDF: import chúng mất tới vài giây
+# nên không để ở đầu module, giúp giao diện khởi động nhanh.
+def _pyplot():
+    """Import matplotlib.pyplot khi cần, với backend Agg (chỉ vẽ ra ảnh, dùng được từ luồng nền của GUI)."""
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib import pyplot as plt
+    return plt
 
 # Hàm hỗ trợ làm sạch tên file/sheet
 def sanitize_filename(name):
@@ -31,82 +56,140 @@ def setup_paths():
         'logo_path': "triac_logo.png" # Thêm đường dẫn logo
     }
 
-def read_configs(template_file):
-    """Đọc cấu hình từ file template Excel."""
-    try:
-        year_mode_df = pd.read_excel(template_file, sheet_name='Config_Year_Mode', engine='openpyxl')
-        project_filter_df = pd.read_excel(template_file, sheet_name='Config_Project_Filter', engine='openpyxl')
-
-        # Xử lý mode, year, months an toàn hơn
-        mode_row = year_mode_df.loc[year_mode_df['Key'].str.lower() == 'mode', 'Value']
-        mode = str(mode_row.values[0]).strip().lower() if not mode_row.empty and pd.notna(mode_row.values[0]) else 'year'
-
-        year_row = year_mode_df.loc[year_mode_df['Key'].str.lower() == 'year', 'Value']
-        year = int(year_row.values[0]) if not year_row.empty and pd.notna(year_row.values[0]) and pd.api.types.is_number(year_row.values[0]) else datetime.datetime.now().year
-        
-        months_row = year_mode_df.loc[year_mode_df['Key'].str.lower() == 'months', 'Value']
-        months = [m.strip().capitalize() for m in str(months_row.values[0]).split(',')] if not months_row.empty and pd.notna(months_row.values[0]) else []
-        
-        if 'Include' in project_filter_df.columns:
-            project_filter_df['Include'] = project_filter_df['Include'].astype(str).str.lower()
-
-        return {
-            'mode': mode,
-            'year': year,
-            'months': months,
-            'project_filter_df': project_filter_df
-        }
-    except FileNotFoundError:
-        print(f"Lỗi: Không tìm thấy file template tại {template_file}")
-        return {'mode': 'year', 'year': datetime.datetime.now().year, 'months': [], 'project_filter_df': pd.DataFrame(columns=['Project Name', 'Include'])}
-    except Exception as e:
-        print(f"Lỗi khi đọc cấu hình: {e}")
-        return {'mode': 'year', 'year': datetime.datetime.now().year, 'months': [], 'project_filter_df': pd.DataFrame(columns=['Project Name', 'Include'])}
-
-def load_raw_data(template_file):
-    """Tải dữ liệu thô từ file template Excel."""
-    try:
-        df = pd.read_excel(template_file, sheet_name='Raw Data', engine='openpyxl')
-        df.columns = df.columns.str.strip()
-        df.rename(columns={'Hou': 'Hours', 'Team member': 'Employee', 'Project Name': 'Project name'}, inplace=True)
-        
-        df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-        df = df.dropna(subset=['Date']) # Loại bỏ hàng không có ngày hợp lệ
-        
-        df['Year'] = df['Date'].dt.year
-        df['MonthName'] = df['Date'].dt.month_name()
-        df['Week'] = df['Date'].dt.isocalendar().week.astype(int)
-        
-        # Đảm bảo cột 'Hours' là số
-        df['Hours'] = pd.to_numeric(df['Hours'], errors='coerce').fillna(0)
-        
-        return df
-    except Exception as e:
-        print(f"Lỗi khi tải dữ liệu thô: {e}")
-        return pd.DataFrame()
-
-def apply_filters(df, config):
-    """Áp dụng các bộ lọc dữ liệu dựa trên cấu hình."""
-    df_filtered = df.copy()
-
-    if 'years' in config and config['years']: # Dành cho so sánh nhiều năm
-        df_filtered = df_filtered[df_filtered['Year'].isin(config['years'])]
-    elif 'year' in config and config['year']: # Dành cho báo cáo tiêu chuẩn một năm
-        df_filtered = df_filtered[df_filtered['Year'] == config['year']]
-
-    if config['months']:
-        df_filtered = df_filtered[df_filtered['MonthName'].isin(config['months'])]
-
-    if not config['project_filter_df'].empty:
-        selected_project_names = config['project_filter_df']['Project Name'].tolist()
-        df_filtered = df_filtered[df_filtered['Project name'].isin(selected_project_names)]
-    else:
-        return pd.DataFrame(columns=df.columns) 
-
-    return df_filtered
+_HEADER_BORDER = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+
+def cube_covers(df_cube, columns):
+    """Khối tổng hợp trả lời được truy vấn nếu nhóm của truy vấn thô hơn (là tập con) các chiều của khối."""
+    return df_cube is not None and not df_cube.empty and all(col in df_cube.columns for col in columns)
+
+
+FILTER_INDEX_COLUMNS = ['Year', 'MonthName', 'Project name']
+
+@instrumentation.traced()
+def build_filter_index(df):
+    """
+    Xây chỉ mục lọc cho df: với mỗi cột Year/MonthName/Project name, ánh xạ giá trị -> mảng vị trí hàng
+    (đã sắp xếp). Chỉ mục chỉ hợp lệ với đúng DataFrame đã dùng để xây nó.
+    """
+    columns = {}
+    for col in FILTER_INDEX_COLUMNS:
+        if col in df.columns:
+            columns[col] = df.groupby(col, observed=True, sort=False).indices
+    return {'n_rows': len(df), 'columns': columns}
+
+_data_versions = itertools.count(1)
+
+@instrumentation.traced()
+def build_report_data(df_raw, aggregated=False):
+    """
+    Chuẩn bị mọi thứ các báo cáo cần từ dữ liệu thô đã nạp: khối tổng hợp đầy đủ, khối cuộn lên
+    Year × Month × Project cho báo cáo so sánh, và chỉ mục lọc của từng khung.
+    aggregated=True: df_raw đã là khối tổng hợp (load_workbook_aggregates) và được dùng luôn làm df_cube;
+    khi đó báo cáo Excel phải xuất với include_raw_data=False.
+    """
+    # Tổng hợp trước một lần để các báo cáo không phải quét lại dữ liệu thô
+    df_cube = df_raw if aggregated else build_aggregate_cube(df_raw)
+    df_cube_month = build_aggregate_cube(df_cube, ['Year', 'MonthName', 'Project name'])
+    # Chỉ mục vị trí hàng theo Year/Month/Project để các bộ lọc không phải quét toàn bộ
+    cube_index = build_filter_index(df_cube)
+    return {
+        'data_version': next(_data_versions), # Khóa ghi nhớ kết quả so sánh (comparison_results) theo lần nạp
+        'aggregated': aggregated,
+        'df_raw': df_raw,
+        'df_cube': df_cube,
+        'df_cube_month': df_cube_month,
+        'raw_index': cube_index if aggregated else build_filter_index(df_raw),
+        'cube_index': cube_index,
+        'cube_month_index': build_filter_index(df_cube_month),
+    }
 
-def export_report(df, config, output_file_path):
-    """Xuất báo cáo tiêu chuẩn ra file Excel."""
+@instrumentation.traced()
+def load_report_data(source, use_cache=False, aggregated=False):
+    """
+    Nạp dữ liệu cho các báo cáo (như build_report_data, kèm 'config') từ một workbook, thư mục/mẫu glob
+    các workbook (load_workbooks_data, dạng gọn) hoặc cơ sở dữ liệu SQLite.
+    aggregated=True: chỉ nạp khối tổng hợp (load_workbook_aggregates, dạng gọn), không giữ dữ liệu thô; cũng được dùng
+    tự động khi không đủ bộ nhớ để nạp dữ liệu thô (MemoryError). Với SQLite, khối (dạng gọn) được tổng hợp bằng GROUP BY trong SQL và các hàng chi tiết được truy vấn
+    riêng cho từng báo cáo (standard_report_frames) thay vì đọc cả bảng.
+    """
+    if data_source.is_database(source):
+        database = data_source.open_source(source)
+        report_data = build_report_data(compact_raw_frame(database.aggregate()), aggregated=True)
+        report_data['source'] = database
+        report_data['config'] = database.read_configs()
+        return report_data
+    if not aggregated:
+        try:
+            config, df_raw = load_workbooks_data(source, use_cache=use_cache, compact=True)
+            report_data = build_report_data(df_raw)
+            report_data['config'] = config
+            return report_data
+        except MemoryError:
+            print(f"Cảnh báo: Không đủ bộ nhớ để nạp dữ liệu thô của {source}, chỉ nạp khối tổng hợp.")
+            df_raw = None # Giải phóng phần đã nạp trước khi nạp lại theo lô
+            instrumentation.current_span().attributes['memory_fallback'] = True
+    config, df_cube = load_workbook_aggregates(source)
+    report_data = build_report_data(compact_raw_frame(df_cube), aggregated=True)
+    report_data['config'] = config
+    return report_data
+
+def standard_report_frames(report_data, config):
+    """
+    (df_filtered, df_aggregates, include_raw_data) của một báo cáo tiêu chuẩn: df_aggregates là khối tổng hợp
+    lọc theo config, df_filtered là các hàng thô được chọn (lọc df_raw bằng chỉ mục, hoặc truy vấn nguồn SQLite).
+    Khi chỉ có khối tổng hợp, df_filtered chính là df_aggregates và báo cáo Excel không ghi dữ liệu chi tiết.
+    """
+    df_aggregates = apply_filters(report_data['df_cube'], config, report_data['cube_index'])
+    if not report_data['aggregated']:
+        return apply_filters(report_data['df_raw'], config, report_data['raw_index']), df_aggregates, True
+    source = report_data.get('source')
+    if source is None:
+        return df_aggregates, df_aggregates, False
+    if df_aggregates.empty: # Không có hàng nào được chọn, không cần truy vấn
+        return df_aggregates, df_aggregates, True
+    return source.load_raw_data(config, columns=None), df_aggregates, True
+
+
+def _partition_by_project(df):
+    """
+    Chia df theo 'Project name' chỉ với một lần quét: sắp xếp ổn định theo mã dự án (theo thứ tự xuất hiện)
+    rồi cắt thành các đoạn liên tiếp. Trả về danh sách (project, df_proj); mỗi df_proj là một lát cắt
+    của khung đã sắp xếp, không tạo bản sao riêng cho từng dự án.
+    """
+    if df.empty:
+        return []
+    codes, projects = pd.factorize(df['Project name'], sort=False)
+    order = np.argsort(codes, kind='stable')
+    df_sorted = df.take(order)
+    counts = np.bincount(codes[codes >= 0], minlength=len(projects))
+    start = int((codes < 0).sum()) # Các hàng không có tên dự án (mã -1) nằm đầu, bỏ qua
+    partitions = []
+    for project, count in zip(projects, counts):
+        partitions.append((project, df_sorted.iloc[start:start + count]))
+        start += count
+    return partitions
+
+def _header_cells(ws, columns):
+    """Ô tiêu đề cho sheet write-only, cùng kiểu định dạng với tiêu đề do DataFrame.to_excel tạo."""
+    cells = []
+    for col in columns:
+        cell = WriteOnlyCell(ws, value=col)
+        cell.font = Font(bold=True)
+        cell.border = _HEADER_BORDER
+        cell.alignment = Alignment(horizontal='center', vertical='top')
+        cells.append(cell)
+    return cells
+
+@instrumentation.traced()
+def export_report(df, config, output_file_path, df_aggregates=None, specs=None, include_raw_data=True):
+    """
+    Xuất báo cáo tiêu chuẩn ra file Excel.
+    df_aggregates: khối tổng hợp (build_aggregate_cube) đã lọc cùng điều kiện với df; nếu có, các bảng
+    tổng hợp được tính từ khối, df chỉ còn dùng để ghi dữ liệu chi tiết của từng dự án.
+    specs: đặc tả biểu đồ đã tính sẵn (chart_specs.build_standard_chart_specs), dùng chung với báo cáo PDF.
+    include_raw_data=False: sheet dự án chỉ có bảng và biểu đồ theo Task, không ghi dữ liệu chi tiết
+    (df khi đó có thể chính là khối tổng hợp, ví dụ khi nạp streaming).
+    """
     mode = config.get('mode', 'year')
     
     groupby_cols = []
@@ -126,21 +209,25 @@ def export_report(df, config, output_file_path):
         print("Cảnh báo: DataFrame đã lọc trống, không có báo cáo nào được tạo.")
         return False
 
-    summary = df.groupby(groupby_cols)['Hours'].sum().reset_index()
+    summary_source = df_aggregates if cube_covers(df_aggregates, groupby_cols + ['Task']) else df
+    summary = summary_source.groupby(groupby_cols, observed=True)['Hours'].sum().reset_index()
 
     try:
-        with pd.ExcelWriter(output_file_path, engine='openpyxl') as writer:
-            summary.to_excel(writer, sheet_name='Summary', index=False)
-
-        wb = load_workbook(output_file_path)
-        ws = wb['Summary']
+        # Dựng toàn bộ workbook trong một lượt ở chế độ write-only: các hàng được ghi thẳng ra file
+        # khi lưu, không giữ đối tượng cell trong bộ nhớ và không phải lưu/mở lại file.
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet('Summary')
+        ws.append(_header_cells(ws, summary.columns))
+        for row_data in dataframe_to_rows(summary, index=False, header=False):
+            ws.append(row_data)
         
         if len(summary) > 0:
             data_col_idx = summary.columns.get_loc('Hours') + 1
             cats_col_idx = summary.columns.get_loc('Project name') + 1
+            summary_last_row = len(summary) + 1
 
-            data_ref = Reference(ws, min_col=data_col_idx, min_row=2, max_row=ws.max_row)
-            cats_ref = Reference(ws, min_col=cats_col_idx, min_row=2, max_row=ws.max_row)
+            data_ref = Reference(ws, min_col=data_col_idx, min_row=2, max_row=summary_last_row)
+            cats_ref = Reference(ws, min_col=cats_col_idx, min_row=2, max_row=summary_last_row)
 
             chart = BarChart()
             chart.title = f"Total Hours by Project ({mode})"
@@ -151,68 +238,80 @@ def export_report(df, config, output_file_path):
             chart.set_categories(cats_ref)
             ws.add_chart(chart, "F2")
 
-        for project in df['Project name'].unique():
-            df_proj = df[df['Project name'] == project]
-            sheet_title = sanitize_filename(project)
-            
-            if sheet_title in wb.sheetnames:
-                ws_proj = wb[sheet_title]
-            else:
-                ws_proj = wb.create_sheet(title=sheet_title)
+        # Bảng + biểu đồ Hours theo Task của mọi dự án được tổng hợp bằng một lần groupby
+        task_specs = specs['Task'] if specs and 'Task' in specs else chart_specs.project_chart_specs(summary_source, 'Task')
 
-            summary_task = df_proj.groupby('Task')['Hours'].sum().reset_index().sort_values('Hours', ascending=False)
-            
-            if not summary_task.empty:
-                ws_proj.append(['Task', 'Hours'])
-                for row_data in dataframe_to_rows(summary_task, index=False, header=False):
+        # Chia dữ liệu theo dự án một lần thay vì so sánh toàn cột cho từng dự án.
+        # Các dự án trùng tên sheet sau khi làm sạch được gom vào cùng một sheet (sheet write-only chỉ ghi được một lượt).
+        project_sheets = {}
+        if include_raw_data:
+            project_groups = _partition_by_project(df)
+        else:
+            project_groups = [(project, None) for project in summary_source['Project name'].dropna().unique()]
+        for project, df_proj in project_groups:
+            project_sheets.setdefault(sanitize_filename(project), []).append((project, df_proj))
+
+        for sheet_title, sheet_projects in project_sheets.items():
+            ws_proj = wb.create_sheet(title=sheet_title)
+            last_row = 0 # Hàng cuối cùng đã ghi trên sheet
+
+            for project, df_proj in sheet_projects:
+                task_spec = task_specs.get(project)
+                if task_spec:
+                    task_header_row = last_row + 1
+                    ws_proj.append(['Task', 'Hours'])
+                    for row_data in zip(task_spec['labels'], task_spec['values']):
+                        ws_proj.append(row_data)
+                    last_row += len(task_spec['labels']) + 1
+                    chart_specs.add_excel_bar_chart(ws_proj, task_spec, task_header_row, f"E{task_header_row}")
+
+                if df_proj is None:
+                    if task_spec: # Chừa chỗ cho biểu đồ trước dự án tiếp theo trên cùng sheet
+                        for _ in range(15):
+                            ws_proj.append([])
+                        last_row += 15
+                    continue
+
+                # Dữ liệu chi tiết bắt đầu sau bảng tổng hợp, chừa chỗ cho biểu đồ
+                start_row_raw_data = last_row + 2 if last_row > 1 else 1
+                if task_spec:
+                    start_row_raw_data += 15
+                for _ in range(last_row + 1, start_row_raw_data):
+                    ws_proj.append([])
+
+                for row_data in dataframe_to_rows(df_proj, index=False, header=True):
                     ws_proj.append(row_data)
-
-                chart_task = BarChart()
-                chart_task.title = f"{project} - Hours by Task"
-                chart_task.x_axis.title = "Task"
-                chart_task.y_axis.title = "Hours"
-                task_len = len(summary_task)
-                
-                data_ref_task = Reference(ws_proj, min_col=2, min_row=1, max_row=task_len + 1)
-                cats_ref_task = Reference(ws_proj, min_col=1, min_row=2, max_row=task_len + 1)
-                chart_task.add_data(data_ref_task, titles_from_data=True)
-                chart_task.set_categories(cats_ref_task)
-                ws_proj.add_chart(chart_task, f"E1")
-
-            start_row_raw_data = ws_proj.max_row + 2 if ws_proj.max_row > 1 else 1
-            if not summary_task.empty:
-                start_row_raw_data += 15
-
-            for r_idx, r in enumerate(dataframe_to_rows(df_proj, index=False, header=True)):
-                for c_idx, cell_val in enumerate(r):
-                    ws_proj.cell(row=start_row_raw_data + r_idx, column=c_idx + 1, value=cell_val)
+                last_row = start_row_raw_data + len(df_proj)
         
         ws_config = wb.create_sheet("Config_Info")
-        ws_config['A1'], ws_config['B1'] = "Mode", config.get('mode', 'N/A').capitalize()
-        ws_config['A2'], ws_config['B2'] = "Year(s)", ', '.join(map(str, config.get('years', []))) if config.get('years') else str(config.get('year', 'N/A'))
-        ws_config['A3'], ws_config['B3'] = "Months", ', '.join(config.get('months', [])) if config.get('months') else "All"
+        ws_config.append(["Mode", config.get('mode', 'N/A').capitalize()])
+        ws_config.append(["Year(s)", ', '.join(map(str, config.get('years', []))) if config.get('years') else str(config.get('year', 'N/A'))])
+        ws_config.append(["Months", ', '.join(config.get('months', [])) if config.get('months') else "All"])
         
         if 'project_filter_df' in config and not config['project_filter_df'].empty:
             selected_projects_display = config['project_filter_df'][config['project_filter_df']['Include'].astype(str).str.lower() == 'yes']['Project Name'].tolist()
-            ws_config['A4'], ws_config['B4'] = "Projects Included", ', '.join(selected_projects_display)
+            ws_config.append(["Projects Included", ', '.join(selected_projects_display)])
         else:
-            ws_config['A4'], ws_config['B4'] = "Projects Included", "No projects selected or found"
+            ws_config.append(["Projects Included", "No projects selected or found"])
 
-        # Remove template sheets
-        for sheet_name in ['Raw Data', 'Config_Year_Mode', 'Config_Project_Filter']:
-            if sheet_name in wb.sheetnames:
-                del wb[sheet_name]
-
-        wb.save(output_file_path)
+        with instrumentation.span('save_workbook'):
+            wb.save(output_file_path)
         return True
     except Exception as e:
         print(f"Lỗi khi xuất báo cáo tiêu chuẩn: {e}")
         return False
 
-def export_pdf_report(df, config, pdf_report_path, logo_path):
-    """Xuất báo cáo PDF tiêu chuẩn với các biểu đồ."""
+@instrumentation.traced()
+def export_pdf_report(df, config, pdf_report_path, logo_path, chart_workers=None, vector_charts=False, specs=None, chart_backend='matplotlib'):
+    """
+    Xuất báo cáo PDF tiêu chuẩn với các biểu đồ.
+    chart_workers: số process vẽ biểu đồ song song (None = số nhân CPU, 1 = vẽ tuần tự trên luồng hiện tại).
+    vector_charts: nhúng biểu đồ dạng vector (SVG) thay vì ảnh PNG.
+    specs: đặc tả biểu đồ đã tính sẵn (chart_specs.build_standard_chart_specs), dùng chung với báo cáo Excel.
+    chart_backend: 'matplotlib' (ảnh) hoặc 'pdf' (vẽ thẳng bằng lệnh vector của fpdf, không cần matplotlib).
+    """
+    from fpdf import FPDF
     today_str = datetime.datetime.today().strftime("%Y-%m-%d")
-    tmp_dir = tempfile.mkdtemp()
     charts_for_pdf = []
 
     def create_pdf_from_charts(charts_data, output_path, title, config_info, logo_path_inner):
@@ -233,8 +332,8 @@ def export_pdf_report(df, config, pdf_report_path, logo_path):
         for key, value in config_info.items():
             pdf.cell(0, 7, f"{key}: {value}", ln=True, align='C')
 
-        for img_path, chart_title, page_project_name in charts_data:
-            if img_path and os.path.exists(img_path):
+        for chart, chart_title, page_project_name in charts_data:
+            if chart:
                 pdf.add_page()
                 if os.path.exists(logo_path_inner):
                     pdf.image(logo_path_inner, x=10, y=8, w=25)
@@ -243,14 +342,17 @@ def export_pdf_report(df, config, pdf_report_path, logo_path):
                 if page_project_name:
                     pdf.cell(0, 10, f"Project: {page_project_name}", ln=True, align='C')
                 pdf.cell(0, 10, chart_title, ln=True, align='C')
-                pdf.image(img_path, x=10, y=45, w=190)
-
-        pdf.output(output_path, "F")
+                if isinstance(chart, dict): # Đặc tả biểu đồ: vẽ trực tiếp lên trang, ngay dưới tiêu đề
+                    width, height = chart['figsize']
+                    chart_specs.draw_pdf_bar_chart(pdf, chart, x=10, y=pdf.get_y() + 2, w=190, h=190 * height / width)
+                else:
+                    pdf.image(io.BytesIO(chart), x=10, y=45, w=190) # Ảnh nằm trong bộ nhớ, không qua file tạm
+
+        with instrumentation.span('pdf_output', pages=pdf.page_no()):
+            pdf.output(output_path)
         print(f"DEBUG: PDF report generated at {output_path}")
 
     try:
-        projects = df['Project name'].unique() 
-
         config_info = {
             "Mode": config.get('mode', 'N/A').capitalize(),
             "Years": ', '.join(map(str, config.get('years', []))) if config.get('years') else str(config.get('year', 'N/A')),
@@ -258,43 +360,26 @@ def export_pdf_report(df, config, pdf_report_path, logo_path):
             "Projects Included": ', '.join(config['project_filter_df']['Project Name']) if 'project_filter_df' in config and not config['project_filter_df'].empty else "No projects selected or found"
         }
 
-        plt.rcParams['font.family'] = 'sans-serif'
-        plt.rcParams['font.sans-serif'] = ['Arial', 'Helvetica', 'Liberation Sans']
-        plt.rcParams['axes.unicode_minus'] = False 
-
-        for project in projects:
-            safe_project = sanitize_filename(project)
-            df_proj = df[df['Project name'] == project]
-
-            if 'Workcentre' in df_proj.columns and not df_proj['Workcentre'].empty:
-                workcentre_summary = df_proj.groupby('Workcentre')['Hours'].sum().sort_values(ascending=False)
-                if not workcentre_summary.empty and workcentre_summary.sum() > 0:
-                    fig, ax = plt.subplots(figsize=(10, 5))
-                    workcentre_summary.plot(kind='barh', color='skyblue', ax=ax)
-                    ax.set_title(f"{project} - Hours by Workcentre", fontsize=9)
-                    ax.tick_params(axis='y', labelsize=8)
-                    ax.set_xlabel("Hours")
-                    ax.set_ylabel("Workcentre")
-                    wc_img_path = os.path.join(tmp_dir, f"{safe_project}_wc.png")
-                    plt.tight_layout()
-                    fig.savefig(wc_img_path, dpi=150)
-                    plt.close(fig)
-                    charts_for_pdf.append((wc_img_path, f"{project} - Hours by Workcentre", project))
-
-            if 'Task' in df_proj.columns and not df_proj['Task'].empty:
-                task_summary = df_proj.groupby('Task')['Hours'].sum().sort_values(ascending=False)
-                if not task_summary.empty and task_summary.sum() > 0:
-                    fig, ax = plt.subplots(figsize=(10, 6))
-                    task_summary.plot(kind='barh', color='lightgreen', ax=ax)
-                    ax.set_title(f"{project} - Hours by Task", fontsize=9)
-                    ax.tick_params(axis='y', labelsize=8)
-                    ax.set_xlabel("Hours")
-                    ax.set_ylabel("Task")
-                    task_img_path = os.path.join(tmp_dir, f"{safe_project}_task.png")
-                    plt.tight_layout()
-                    fig.savefig(task_img_path, dpi=150)
-                    plt.close(fig)
-                    charts_for_pdf.append((task_img_path, f"{project} - Hours by Task", project))
+        # Dữ liệu của mọi biểu đồ được tổng hợp trước (mỗi chiều một lần groupby cho tất cả dự án)
+        if specs is None:
+            specs = chart_specs.build_standard_chart_specs(df)
+        chart_pages = []
+        for project in specs['projects']:
+            for dimension in ('Workcentre', 'Task'):
+                spec = specs.get(dimension, {}).get(project)
+                if spec and sum(spec['values']) > 0:
+                    chart_pages.append((spec, project))
+
+        if chart_backend == 'pdf':
+            charts_for_pdf = [(spec, spec['title'], project) for spec, project in chart_pages]
+        else:
+            # Vẽ tất cả (có thể song song) thành ảnh trong bộ nhớ
+            image_format = 'svg' if vector_charts else 'png'
+            chart_jobs = [chart_rendering.spec_chart_job(spec, image_format) for spec, _ in chart_pages]
+            with instrumentation.span('render_charts', charts=len(chart_jobs)):
+                chart_images = chart_rendering.render_charts(chart_jobs, chart_workers)
+            for img_data, (spec, project) in zip(chart_images, chart_pages):
+                charts_for_pdf.append((img_data, spec['title'], project))
 
         if not charts_for_pdf:
             print("Cảnh báo: Không có biểu đồ nào được tạo để đưa vào PDF. PDF có thể trống.")
@@ -309,36 +394,50 @@ def export_pdf_report(df, config, pdf_report_path, logo_path):
             for key, value in config_info.items():
                 pdf.cell(0, 7, f"{key}: {value}", ln=True, align='C')
             pdf.cell(0, 10, "No charts generated for this report.", ln=True, align='C')
-            pdf.output(pdf_report_path, "F")
+            pdf.output(pdf_report_path)
             return True
             
-        create_pdf_from_charts(charts_for_pdf, pdf_report_path, "TRIAC TIME REPORT - STANDARD", config_info, logo_path)
+        with instrumentation.span('build_pdf', charts=len(charts_for_pdf)):
+            create_pdf_from_charts(charts_for_pdf, pdf_report_path, "TRIAC TIME REPORT - STANDARD", config_info, logo_path)
         return True
     except Exception as e:
         print(f"Lỗi khi tạo báo cáo PDF: {e}")
         return False
-    finally:
-        if os.path.exists(tmp_dir):
-            shutil.rmtree(tmp_dir)
 
-def apply_comparison_filters(df_raw, comparison_config, comparison_mode):
-    """Áp dụng bộ lọc và tạo DataFrame tóm tắt cho báo cáo so sánh."""
+@instrumentation.traced()
+def export_standard_reports(df, config, output_file_path, pdf_report_path, logo_path, df_aggregates=None, chart_backend='pdf', include_raw_data=True):
+    """
+    Xuất cả báo cáo Excel và PDF tiêu chuẩn từ MỘT lần lọc/tổng hợp: đặc tả biểu đồ được tính một lần
+    rồi hai file được ghi đồng thời trên hai luồng. Trả về (excel_ok, pdf_ok).
+    Mặc định biểu đồ PDF được vẽ bằng lệnh vector của fpdf (chart_backend='pdf'), không qua matplotlib.
+    include_raw_data: như của export_report.
+    """
+    summary_source = df_aggregates if df_aggregates is not None else df
+    with instrumentation.span('build_chart_specs', rows_in=len(summary_source)):
+        specs = chart_specs.build_standard_chart_specs(summary_source)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        excel_future = executor.submit(export_report, df, config, output_file_path, df_aggregates, specs, include_raw_data)
+        pdf_future = executor.submit(export_pdf_report, summary_source, config, pdf_report_path, logo_path,
+                                     specs=specs, chart_backend=chart_backend)
+        return excel_future.result(), pdf_future.result()
+
+@instrumentation.traced()
+def apply_comparison_filters(df_raw, comparison_config, comparison_mode, filter_index=None):
+    """Áp dụng bộ lọc và tạo DataFrame tóm tắt cho báo cáo so sánh (filter_index: chỉ mục của df_raw)."""
     years = comparison_config.get('years', [])
     months = comparison_config.get('months', [])
     selected_projects = comparison_config.get('selected_projects', [])
 
-    df_filtered = df_raw.copy()
+    if not selected_projects:
+        return pd.DataFrame(), "Vui lòng chọn ít nhất một dự án để so sánh."
 
+    filters = {}
     if years:
-        df_filtered = df_filtered[df_filtered['Year'].isin(years)]
-    
+        filters['Year'] = list(years)
     if months:
-        df_filtered = df_filtered[df_filtered['MonthName'].isin(months)]
-    
-    if selected_projects:
-        df_filtered = df_filtered[df_filtered['Project name'].isin(selected_projects)]
-    else: 
-        return pd.DataFrame(), "Vui lòng chọn ít nhất một dự án để so sánh."
+        filters['MonthName'] = list(months)
+    filters['Project name'] = list(selected_projects)
+    df_filtered = select_rows(df_raw, filters, filter_index)
 
     if df_filtered.empty:
         return pd.DataFrame(), f"Không tìm thấy dữ liệu cho chế độ so sánh: {comparison_mode} với các lựa chọn hiện tại."
@@ -349,7 +448,7 @@ def apply_comparison_filters(df_raw, comparison_config, comparison_mode):
         if len(years) != 1 or len(months) != 1 or len(selected_projects) < 2:
             return pd.DataFrame(), "Vui lòng chọn MỘT năm, MỘT tháng và ít nhất HAI dự án cho chế độ này."
         
-        df_comparison = df_filtered.groupby('Project name')['Hours'].sum().reset_index()
+        df_comparison = df_filtered.groupby('Project name', observed=True)['Hours'].sum().reset_index()
         df_comparison.rename(columns={'Hours': 'Total Hours'}, inplace=True)
         title = f"So sánh giờ giữa các dự án trong {months[0]}, năm {years[0]}"
         return df_comparison, title
@@ -358,10 +457,9 @@ def apply_comparison_filters(df_raw, comparison_config, comparison_mode):
         if len(years) != 1 or len(selected_projects) < 2:
             return pd.DataFrame(), "Vui lòng chọn MỘT năm và ít nhất HAI dự án cho chế độ này."
         
-        df_comparison = df_filtered.groupby(['Project name', 'MonthName'])['Hours'].sum().unstack(fill_value=0)
+        df_comparison = df_filtered.groupby(['Project name', 'MonthName'], observed=True)['Hours'].sum().unstack(fill_value=0)
         
-        month_order = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
-        existing_months = [m for m in month_order if m in df_comparison.columns]
+        existing_months = [m for m in MONTH_ORDER if m in df_comparison.columns]
         df_comparison = df_comparison[existing_months]
 
         df_comparison = df_comparison.reset_index().rename(columns={'index': 'Project Name'})
@@ -385,7 +483,7 @@ def apply_comparison_filters(df_raw, comparison_config, comparison_mode):
 
         if len(years) == 1 and len(months) > 0:
             # So sánh một dự án qua CÁC THÁNG trong MỘT năm
-            df_comparison = df_filtered.groupby('MonthName')['Hours'].sum().reset_index()
+            df_comparison = df_filtered.groupby('MonthName', observed=True)['Hours'].sum().reset_index()
             df_comparison.rename(columns={'Hours': f'Total Hours for {selected_project_name}'}, inplace=True)
             
             # Đảm bảo thứ tự tháng đúng cho biểu đồ
@@ -400,7 +498,7 @@ def apply_comparison_filters(df_raw, comparison_config, comparison_mode):
 
         elif len(years) > 1 and not months:
             # So sánh một dự án qua CÁC NĂM
-            df_comparison = df_filtered.groupby('Year')['Hours'].sum().reset_index()
+            df_comparison = df_filtered.groupby('Year', observed=True)['Hours'].sum().reset_index()
             df_comparison.rename(columns={'Hours': f'Total Hours for {selected_project_name}'}, inplace=True)
             df_comparison['Year'] = df_comparison['Year'].astype(str) # Chuyển năm thành chuỗi cho trục X nếu cần
             
@@ -414,6 +512,52 @@ def apply_comparison_filters(df_raw, comparison_config, comparison_mode):
         
     return pd.DataFrame(), "Chế độ so sánh không hợp lệ."
 
+# Ghi nhớ (LRU) kết quả apply_comparison_filters theo (chế độ, năm, tháng, dự án, phiên bản dữ liệu):
+# người dùng thường bấm Excel rồi PDF, hoặc đổi qua lại giữa vài lựa chọn quen thuộc.
+COMPARISON_MEMO_SIZE = 32
+_comparison_memo = OrderedDict()
+_comparison_memo_lock = threading.Lock()
+
+def comparison_memo_key(comparison_config, comparison_mode, data_version):
+    """Khóa chuẩn hóa: thứ tự chọn năm/tháng/dự án không ảnh hưởng đến kết quả so sánh."""
+    return (
+        comparison_mode,
+        tuple(sorted(comparison_config.get('years', []), key=str)),
+        tuple(sorted(comparison_config.get('months', []), key=str)),
+        tuple(sorted(comparison_config.get('selected_projects', []), key=str)),
+        data_version,
+    )
+
+def comparison_results(df_raw, comparison_config, comparison_mode, filter_index=None, data_version=None):
+    """
+    Như apply_comparison_filters nhưng ghi nhớ kết quả cho mỗi data_version (build_report_data).
+    data_version None: không ghi nhớ. Trả về bản sao DataFrame để người gọi sửa thoải mái.
+    """
+    if data_version is None:
+        return apply_comparison_filters(df_raw, comparison_config, comparison_mode, filter_index)
+
+    key = comparison_memo_key(comparison_config, comparison_mode, data_version)
+    with instrumentation.span('comparison_memo_lookup') as lookup:
+        with _comparison_memo_lock:
+            cached = _comparison_memo.get(key)
+            if cached is not None:
+                _comparison_memo.move_to_end(key)
+        lookup.attributes['hit'] = cached is not None
+    if cached is None:
+        cached = apply_comparison_filters(df_raw, comparison_config, comparison_mode, filter_index)
+        with _comparison_memo_lock:
+            _comparison_memo[key] = cached
+            while len(_comparison_memo) > COMPARISON_MEMO_SIZE:
+                _comparison_memo.popitem(last=False)
+    df_comparison, title = cached
+    return df_comparison.copy(), title
+
+def clear_comparison_memo():
+    """Xóa toàn bộ kết quả so sánh đã ghi nhớ (gọi khi nạp lại dữ liệu)."""
+    with _comparison_memo_lock:
+        _comparison_memo.clear()
+
+@instrumentation.traced()
 def export_comparison_report(df_comparison, comparison_config, output_file_path, comparison_mode):
     """Xuất báo cáo so sánh ra file Excel."""
     try:
@@ -547,15 +691,19 @@ def export_comparison_report(df_comparison, comparison_config, output_file_path,
                     chart_placement_row = info_row + 2
                     ws.add_chart(chart, f"A{chart_placement_row}")
 
-            wb.save(output_file_path)
+            with instrumentation.span('save_workbook'):
+                wb.save(output_file_path)
             return True
     except Exception as e:
         print(f"Lỗi khi xuất báo cáo so sánh ra Excel: {e}")
         return False
 
-def export_comparison_pdf_report(df_comparison, comparison_config, pdf_file_path, comparison_mode, logo_path):
-    """Xuất báo cáo PDF so sánh với biểu đồ."""
-    tmp_dir = tempfile.mkdtemp()
+@instrumentation.traced()
+def export_comparison_pdf_report(df_comparison, comparison_config, pdf_file_path, comparison_mode, logo_path, vector_charts=False):
+    """Xuất báo cáo PDF so sánh với biểu đồ (vector_charts: nhúng biểu đồ dạng SVG thay vì PNG)."""
+    from fpdf import FPDF
+    plt = _pyplot()
+    chart_rendering.apply_chart_style() # Font/rcParams chỉ thiết lập một lần cho cả process
     charts_for_pdf = []
 
     def create_pdf_from_charts_comp(charts_data, output_path, title, config_info, logo_path_inner):
@@ -576,8 +724,8 @@ def export_comparison_pdf_report(df_comparison, comparison_config, pdf_file_path
         for key, value in config_info.items():
             pdf.cell(0, 7, f"{key}: {value}", ln=True, align='C')
 
-        for img_path, chart_title, page_project_name in charts_data:
-            if img_path and os.path.exists(img_path):
+        for img_data, chart_title, page_project_name in charts_data:
+            if img_data:
                 pdf.add_page()
                 if os.path.exists(logo_path_inner):
                     pdf.image(logo_path_inner, x=10, y=8, w=25)
@@ -586,12 +734,14 @@ def export_comparison_pdf_report(df_comparison, comparison_config, pdf_file_path
                 if page_project_name:
                     pdf.cell(0, 10, f"Project: {page_project_name}", ln=True, align='C')
                 pdf.cell(0, 10, chart_title, ln=True, align='C')
-                pdf.image(img_path, x=10, y=45, w=190)
+                pdf.image(io.BytesIO(img_data), x=10, y=45, w=190) # Ảnh nằm trong bộ nhớ, không qua file tạm
 
-        pdf.output(output_path, "F")
+        with instrumentation.span('pdf_output', pages=pdf.page_no()):
+            pdf.output(output_path)
         print(f"DEBUG: PDF report generated at {output_path}")
 
-    def create_comparison_chart(df, mode, title, x_label, y_label, img_path, comparison_config_inner):
+    @instrumentation.traced('render_comparison_chart')
+    def create_comparison_chart(df, mode, title, x_label, y_label, comparison_config_inner):
         fig, ax = plt.subplots(figsize=(12, 7))  
         
         df_plot = df.copy()  
@@ -608,10 +758,6 @@ def export_comparison_pdf_report(df_comparison, comparison_config, pdf_file_path
             return None 
 
         ax.set_ylim(bottom=0)
-        
-        plt.rcParams['font.family'] = 'sans-serif'
-        plt.rcParams['font.sans-serif'] = ['Arial', 'Helvetica', 'Liberation Sans']
-        plt.rcParams['axes.unicode_minus'] = False 
 
         if mode in ["So Sánh Dự Án Trong Một Tháng", "Compare Projects in a Month"]:
             df_plot.plot(kind='bar', x='Project name', y='Total Hours', ax=ax, color='teal')
@@ -661,9 +807,9 @@ def export_comparison_pdf_report(df_comparison, comparison_config, pdf_file_path
 
         ax.set_title(title, fontsize=10)
         plt.tight_layout()
-        fig.savefig(img_path, dpi=150)
+        img_data = chart_rendering.figure_to_bytes(fig, 'svg' if vector_charts else 'png', dpi=150)
         plt.close(fig)
-        return img_path
+        return img_data
 
     try:
         config_info = {
@@ -679,7 +825,7 @@ def export_comparison_pdf_report(df_comparison, comparison_config, pdf_file_path
             else:
                 chart_path = create_comparison_chart(df_comparison, comparison_mode, 
                                                      f"So sánh giờ giữa các dự án trong {comparison_config['months'][0]}, năm {comparison_config['years'][0]}",
-                                                     "Dự án", "Giờ", os.path.join(tmp_dir, "comp_proj_month.png"), comparison_config)
+                                                     "Dự án", "Giờ", comparison_config)
             if chart_path:
                 charts_for_pdf.append((chart_path, f"So sánh giờ giữa các dự án trong {comparison_config['months'][0]}, năm {comparison_config['years'][0]}", None))
 
@@ -689,7 +835,7 @@ def export_comparison_pdf_report(df_comparison, comparison_config, pdf_file_path
             else:
                 chart_path = create_comparison_chart(df_comparison, comparison_mode, 
                                                      f"So sánh giờ giữa các dự án trong năm {comparison_config['years'][0]} (theo tháng)",
-                                                     "Tháng", "Giờ", os.path.join(tmp_dir, "comp_proj_year.png"), comparison_config)
+                                                     "Tháng", "Giờ", comparison_config)
             if chart_path:
                 charts_for_pdf.append((chart_path, f"So sánh giờ giữa các dự án trong năm {comparison_config['years'][0]} (theo tháng)", None))
 
@@ -700,11 +846,11 @@ def export_comparison_pdf_report(df_comparison, comparison_config, pdf_file_path
             elif 'MonthName' in df_comparison.columns:
                 chart_path = create_comparison_chart(df_comparison, comparison_mode, 
                                                      f"Tổng giờ dự án {selected_project_name} qua các tháng trong năm {comparison_config['years'][0]}",
-                                                     "Tháng", "Giờ", os.path.join(tmp_dir, f"{sanitize_filename(selected_project_name)}_months.png"), comparison_config)
+                                                     "Tháng", "Giờ", comparison_config)
             elif 'Year' in df_comparison.columns:
                 chart_path = create_comparison_chart(df_comparison, comparison_mode, 
                                                      f"Tổng giờ dự án {selected_project_name} qua các năm",
-                                                     "Năm", "Giờ", os.path.join(tmp_dir, f"{sanitize_filename(selected_project_name)}_years.png"), comparison_config)
+                                                     "Năm", "Giờ", comparison_config)
             if chart_path:
                 charts_for_pdf.append((chart_path, f"Tổng giờ dự án {selected_project_name} qua thời gian", selected_project_name))
 
@@ -721,14 +867,20 @@ def export_comparison_pdf_report(df_comparison, comparison_config, pdf_file_path
             for key, value in config_info.items():
                 pdf.cell(0, 7, f"{key}: {value}", ln=True, align='C')
             pdf.cell(0, 10, "No charts generated for this report.", ln=True, align='C')
-            pdf.output(pdf_file_path, "F")
+            pdf.output(pdf_file_path)
             return True
 
-        create_pdf_from_charts_comp(charts_for_pdf, pdf_file_path, "TRIAC TIME REPORT - COMPARISON", config_info, logo_path)
+        with instrumentation.span('build_pdf', charts=len(charts_for_pdf)):
+            create_pdf_from_charts_comp(charts_for_pdf, pdf_file_path, "TRIAC TIME REPORT - COMPARISON", config_info, logo_path)
         return True
     except Exception as e:
         print(f"Lỗi khi tạo báo cáo PDF so sánh: {e}")
         return False
-    finally:
-        if os.path.exists(tmp_dir):
-            shutil.rmtree(tmp_dir)
+
+@instrumentation.traced()
+def export_comparison_reports(df_comparison, comparison_config, output_file_path, pdf_file_path, comparison_mode, logo_path):
+    """Xuất cả báo cáo so sánh Excel và PDF từ cùng một kết quả lọc, ghi đồng thời trên hai luồng. Trả về (excel_ok, pdf_ok)."""
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        excel_future = executor.submit(export_comparison_report, df_comparison, comparison_config, output_file_path, comparison_mode)
+        pdf_future = executor.submit(export_comparison_pdf_report, df_comparison, comparison_config, pdf_file_path, comparison_mode, logo_path)
+        return excel_future.result(), pdf_future.result()
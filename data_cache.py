@@ -0,0 +1,179 @@
+import datetime
+import hashlib
+import json
+import os
+import pickle
+
+# Bộ nhớ đệm (cache) trên đĩa cho dữ liệu Raw Data đã chuẩn hóa.
+# Cache được đặt cạnh file template, mỗi template một entry gồm:
+#   <key>.pkl       : pickle của {'config': ..., 'df_raw': ...}
+#   <key>.meta.json : đường dẫn, mtime, kích thước và hash nội dung của template,
+#                     cùng raw_state (số hàng/checksum hàng cuối Raw Data) cho nạp tăng dần
+# Entry hợp lệ khi mtime + kích thước khớp, hoặc khi hash nội dung khớp (file được copy/touch lại).
+
+CACHE_DIR_NAME = '.time_report_cache'
+CACHE_FORMAT_VERSION = 2 # Tăng khi cách chuẩn hóa dữ liệu thô thay đổi (2: ngày dạng serial Excel được parse thành ngày thật)
+DEFAULT_MAX_CACHE_BYTES = 512 * 1024 * 1024 # Giới hạn tổng dung lượng cache (512 MB)
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+def get_cache_dir(template_file):
+    """Thư mục cache nằm cạnh file template."""
+    return os.path.join(os.path.dirname(os.path.abspath(template_file)), CACHE_DIR_NAME)
+
+def _entry_key(template_file):
+    normalized_path = os.path.normcase(os.path.abspath(template_file))
+    return hashlib.sha1(normalized_path.encode('utf-8')).hexdigest()[:16]
+
+def _entry_paths(template_file):
+    cache_dir = get_cache_dir(template_file)
+    key = _entry_key(template_file)
+    return os.path.join(cache_dir, f"{key}.pkl"), os.path.join(cache_dir, f"{key}.meta.json")
+
+def file_content_hash(path):
+    """Tính SHA-256 nội dung file theo từng khối để không nạp cả file vào bộ nhớ."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_meta(meta_path, meta):
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+def template_fingerprint(template_file, content_hash=None):
+    """
+    Đường dẫn, mtime, kích thước và hash nội dung của file template. Lấy TRƯỚC khi đọc workbook rồi truyền
+    cho store_cached_data, để file được lưu trong lúc đang nạp không bị cache dữ liệu cũ dưới dấu vân tay mới.
+    """
+    stat = os.stat(template_file)
+    return {
+        'path': os.path.abspath(template_file),
+        'mtime': stat.st_mtime,
+        'size': stat.st_size,
+        'sha256': content_hash if content_hash is not None else file_content_hash(template_file),
+    }
+
+def load_cached_data(template_file):
+    """
+    Trả về (config, df_raw) từ cache nếu file template chưa thay đổi, ngược lại trả về None.
+    """
+    pkl_path, meta_path = _entry_paths(template_file)
+    meta = _read_meta(meta_path)
+    if not meta or meta.get('version') != CACHE_FORMAT_VERSION or not os.path.exists(pkl_path):
+        return None
+
+    try:
+        stat = os.stat(template_file)
+        if stat.st_mtime != meta.get('mtime') or stat.st_size != meta.get('size'):
+            # mtime/kích thước khác: so sánh hash nội dung trước khi kết luận file đã đổi
+            if stat.st_size != meta.get('size') or file_content_hash(template_file) != meta.get('sha256'):
+                return None
+            meta['mtime'] = stat.st_mtime
+            _write_meta(meta_path, meta)
+
+        with open(pkl_path, 'rb') as f:
+            payload = pickle.load(f)
+        os.utime(pkl_path) # Đánh dấu entry vừa được dùng (phục vụ chính sách loại bỏ LRU)
+        return payload['config'], payload['df_raw']
+    except Exception as e:
+        print(f"Cảnh báo: Không đọc được cache cho {template_file}: {e}")
+        return None
+
+def load_cache_entry(template_file):
+    """
+    Trả về (config, df_raw, raw_state) của entry cache hiện có, KHÔNG kiểm tra template có đổi hay không.
+    Dùng cho nạp tăng dần; trả về None nếu không có entry hoặc entry không có raw_state.
+    """
+    pkl_path, meta_path = _entry_paths(template_file)
+    meta = _read_meta(meta_path)
+    if not meta or meta.get('version') != CACHE_FORMAT_VERSION or not meta.get('raw_state') or not os.path.exists(pkl_path):
+        return None
+    try:
+        with open(pkl_path, 'rb') as f:
+            payload = pickle.load(f)
+        return payload['config'], payload['df_raw'], meta['raw_state']
+    except Exception as e:
+        print(f"Cảnh báo: Không đọc được cache cho {template_file}: {e}")
+        return None
+
+def store_cached_data(template_file, config, df_raw, raw_state=None, fingerprint=None, max_cache_bytes=DEFAULT_MAX_CACHE_BYTES):
+    """
+    Ghi (config, df_raw) vào cache của file template. raw_state (số hàng, checksum hàng cuối của
+    Raw Data) được lưu kèm để lần sau có thể nạp tăng dần. fingerprint: kết quả template_fingerprint
+    lấy trước khi đọc file (None = lấy ngay lúc ghi). Trả về True nếu ghi thành công.
+    """
+    pkl_path, meta_path = _entry_paths(template_file)
+    try:
+        os.makedirs(os.path.dirname(pkl_path), exist_ok=True)
+        meta = dict(fingerprint) if fingerprint is not None else template_fingerprint(template_file)
+        meta['version'] = CACHE_FORMAT_VERSION
+        meta['raw_state'] = raw_state
+        meta['created'] = datetime.datetime.now().isoformat(timespec='seconds')
+
+        tmp_path = pkl_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'config': config, 'df_raw': df_raw}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, pkl_path)
+        _write_meta(meta_path, meta)
+
+        enforce_cache_size_limit(os.path.dirname(pkl_path), max_cache_bytes, keep=(pkl_path,))
+        return True
+    except Exception as e:
+        print(f"Cảnh báo: Không ghi được cache cho {template_file}: {e}")
+        return False
+
+def _remove_entry(pkl_path):
+    meta_path = pkl_path[:-len('.pkl')] + '.meta.json'
+    for path in (pkl_path, meta_path):
+        if os.path.exists(path):
+            os.remove(path)
+
+def enforce_cache_size_limit(cache_dir, max_cache_bytes=DEFAULT_MAX_CACHE_BYTES, keep=()):
+    """Xóa các entry ít được dùng gần đây nhất cho đến khi tổng dung lượng cache <= max_cache_bytes."""
+    if not os.path.isdir(cache_dir):
+        return
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith('.pkl'):
+            path = os.path.join(cache_dir, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total_bytes = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries): # Cũ nhất trước
+        if total_bytes <= max_cache_bytes:
+            break
+        if path in keep:
+            continue
+        _remove_entry(path)
+        total_bytes -= size
+
+def invalidate_cache(template_file=None, cache_dir=None):
+    """
+    Xóa cache: của một file template cụ thể, hoặc toàn bộ thư mục cache nếu chỉ truyền cache_dir.
+    Trả về số entry đã xóa.
+    """
+    if template_file is not None:
+        pkl_path, _ = _entry_paths(template_file)
+        removed = 1 if os.path.exists(pkl_path) else 0
+        _remove_entry(pkl_path)
+        return removed
+
+    if cache_dir is None or not os.path.isdir(cache_dir):
+        return 0
+    removed = 0
+    for name in os.listdir(cache_dir):
+        if name.endswith('.pkl'):
+            _remove_entry(os.path.join(cache_dir, name))
+            removed += 1
+    return removed
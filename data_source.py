@@ -0,0 +1,1000 @@
+import argparse
+import contextlib
+import datetime
+import glob
+import hashlib
+import itertools
+import operator
+import os
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from pandas.tseries.api import guess_datetime_format
+
+import data_cache
+import instrumentation
+
+# Nguồn dữ liệu cho báo cáo, tầng nằm dưới core_logic (module này không import core_logic): workbook Excel
+# (.xlsm/.xlsx) như trước, hoặc cơ sở dữ liệu SQLite cục bộ. open_source(path) chọn nguồn theo đuôi file;
+# cả hai có cùng giao diện:
+#   load(include_configs, include_raw_data, use_cache, incremental) -> (config, df_raw), một lần đọc nguồn
+#   read_configs()                  -> cấu hình báo cáo
+#   load_raw_data(config, columns)  -> dữ liệu thô đã chuẩn hóa (lọc theo config nếu có)
+#   aggregate(dimensions, config)   -> tổng Hours/Rows theo các chiều, như build_aggregate_cube
+# Các hàm load_workbook_data, read_configs, load_raw_data, load_workbook_aggregates và load_workbooks_data
+# (nhiều workbook) đi qua open_source; core_logic dùng lại chúng cho giao diện và batch.
+# Với SQLite, bộ lọc và groupby chạy trong SQL (có chỉ mục Year/Month/Project): chỉ các hàng đã tổng hợp
+# mới được đưa vào Python. Các cột khác của Raw Data được lưu thêm vào bảng raw_data (giá trị kiểu SQLite: ngày giờ
+# thành chuỗi) và trả về khi load_raw_data đọc mọi cột. Tạo cơ sở dữ liệu từ một template:
+#   python data_source.py import Time_report.xlsm timesheets.db
+
+RAW_DATA_SHEET = 'Raw Data'
+REPORT_COLUMNS = ('Date', 'Project name', 'Task', 'Workcentre', 'Employee', 'Hours') # Các cột báo cáo thật sự dùng
+CONFIG_SHEETS = ('Config_Year_Mode', 'Config_Project_Filter')
+
+def _default_config():
+    """Cấu hình mặc định khi không đọc được file template."""
+    return {'mode': 'year', 'year': datetime.datetime.now().year, 'months': [], 'project_filter_df': pd.DataFrame(columns=['Project Name', 'Include'])}
+
+def _row_checksum(values):
+    """Checksum ổn định của một hàng, dùng để phát hiện hàng đã bị sửa giữa hai lần nạp."""
+    return hashlib.sha1(repr(tuple(values)).encode('utf-8')).hexdigest()
+
+def _update_rows_digest(digest, rows):
+    """Cộng dồn các hàng vào checksum tuần tự của toàn bộ dữ liệu đã nạp."""
+    for row in rows:
+        digest.update(repr(row).encode('utf-8'))
+    return digest
+
+def _header_columns(header):
+    return [f"Unnamed: {i}" if h is None else h for i, h in enumerate(header)]
+
+def _fit_row(row, width):
+    """Cắt/bù None để hàng có đúng số cột như tiêu đề."""
+    row = tuple(row[:width])
+    if len(row) < width:
+        row += (None,) * (width - len(row))
+    return row
+
+def _collect_rows(rows, width, first_row_number):
+    """Gom các hàng không trống. Trả về (danh sách hàng, số thứ tự trên sheet của hàng có dữ liệu cuối cùng)."""
+    data = []
+    last_row_number = first_row_number - 1
+    for row_number, row in enumerate(rows, start=first_row_number):
+        if all(v is None for v in row):
+            continue # Bỏ qua hàng trống hoàn toàn
+        data.append(_fit_row(row, width))
+        last_row_number = row_number
+    return data, last_row_number
+
+def _rows_to_frame(rows, state=None):
+    """
+    Chuyển các hàng (values_only) của một sheet thành DataFrame, hàng đầu tiên là tiêu đề (giống pd.read_excel).
+    Nếu truyền dict state, ghi lại số hàng và checksum tiêu đề/hàng cuối để phục vụ nạp tăng dần.
+    """
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        return pd.DataFrame()
+    columns = _header_columns(header)
+    data, last_row_number = _collect_rows(rows, len(columns), first_row_number=2)
+    if state is not None:
+        state.update({
+            'header_checksum': _row_checksum(header),
+            'row_count': len(data),
+            'last_row': last_row_number,
+            'tail_checksum': _row_checksum(data[-1]) if data else None,
+            'rows_checksum': _update_rows_digest(hashlib.sha1(), data).hexdigest(),
+        })
+    return pd.DataFrame(data, columns=columns)
+
+def _read_sheet_frames(template_file, sheet_names, raw_state=None):
+    """Mở workbook MỘT lần ở chế độ read-only (streaming) và đọc các sheet yêu cầu thành DataFrame."""
+    wb = load_workbook(template_file, read_only=True, data_only=True, keep_links=False)
+    try:
+        frames = {}
+        for sheet_name in sheet_names:
+            if sheet_name in wb.sheetnames:
+                state = raw_state if sheet_name == RAW_DATA_SHEET else None
+                frames[sheet_name] = _rows_to_frame(wb[sheet_name].iter_rows(values_only=True), state)
+        return frames
+    finally:
+        wb.close()
+
+def _read_appended_raw_rows(template_file, raw_state):
+    """
+    Chỉ đọc các hàng được thêm vào cuối sheet Raw Data kể từ lần nạp được mô tả bởi raw_state.
+    Trả về (frames cấu hình, DataFrame các hàng mới, raw_state mới), hoặc None nếu dữ liệu đã nạp
+    trước đó bị thay đổi (khi đó phải nạp lại toàn bộ), dựa trên tiêu đề, số hàng, checksum hàng cuối
+    và checksum tuần tự của các hàng cũ. openpyxl vẫn phải parse XML của các hàng cũ, nhưng chúng
+    không được dựng lại thành DataFrame và không phải chuẩn hóa lại.
+    """
+    if not raw_state or raw_state.get('tail_checksum') is None:
+        return None
+
+    wb = load_workbook(template_file, read_only=True, data_only=True, keep_links=False)
+    try:
+        frames = {}
+        for sheet_name in CONFIG_SHEETS:
+            if sheet_name in wb.sheetnames:
+                frames[sheet_name] = _rows_to_frame(wb[sheet_name].iter_rows(values_only=True))
+        if RAW_DATA_SHEET not in wb.sheetnames:
+            return None
+
+        rows = wb[RAW_DATA_SHEET].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None or _row_checksum(header) != raw_state['header_checksum']:
+            return None
+        columns = _header_columns(header)
+
+        # Đi qua các hàng đã nạp: đếm lại số hàng và tính lại checksum để phát hiện sửa đổi
+        last_row = raw_state['last_row']
+        digest = hashlib.sha1()
+        row_count = 0
+        tail = None
+        for row_number, row in enumerate(rows, start=2):
+            if all(v is None for v in row):
+                if row_number == last_row:
+                    return None
+                continue
+            tail = _fit_row(row, len(columns))
+            digest.update(repr(tail).encode('utf-8'))
+            row_count += 1
+            if row_number == last_row:
+                break
+        if (row_count != raw_state['row_count']
+                or tail is None or _row_checksum(tail) != raw_state['tail_checksum']
+                or digest.hexdigest() != raw_state['rows_checksum']):
+            return None
+
+        data, new_last_row = _collect_rows(rows, len(columns), first_row_number=last_row + 1)
+    finally:
+        wb.close()
+
+    new_state = dict(raw_state)
+    if data:
+        new_state.update({
+            'row_count': row_count + len(data),
+            'last_row': new_last_row,
+            'tail_checksum': _row_checksum(data[-1]),
+            'rows_checksum': _update_rows_digest(digest, data).hexdigest(),
+        })
+    df_new = pd.DataFrame(data, columns=columns, index=pd.RangeIndex(row_count, row_count + len(data)))
+    return frames, df_new, new_state
+
+def _raw_row_predicate(config):
+    """
+    Điều kiện giữ một hàng thô (ngày, dự án) theo cấu hình báo cáo, cùng ý nghĩa với apply_filters.
+    Ô ngày không phải datetime được giữ lại để lọc chính xác sau khi chuẩn hóa.
+    """
+    project_filter_df = config['project_filter_df']
+    projects = set(project_filter_df['Project Name']) if 'Project Name' in project_filter_df.columns else set()
+    if config.get('years'):
+        years = set(config['years'])
+    elif config.get('year'):
+        years = {config['year']}
+    else:
+        years = None
+    months = {MONTH_ORDER.index(m) + 1 for m in config['months'] if m in MONTH_ORDER} if config.get('months') else None
+
+    def keep(date, project):
+        if date is None or project not in projects:
+            return False
+        if isinstance(date, datetime.date):
+            return (years is None or date.year in years) and (months is None or date.month in months)
+        return True
+    return keep
+
+def _raw_column_picker(header, columns, required=()):
+    """
+    Từ hàng tiêu đề của Raw Data: (các cột trong columns có mặt (None = mọi cột), theo tên đã chuẩn hóa; hàm lấy các giá trị đó
+    từ một hàng; số ô tối thiểu của hàng). Ném ValueError nếu thiếu cột bắt buộc.
+    """
+    names = [str(name).strip() for name in _header_columns(header)]
+    names = [RAW_COLUMN_ALIASES.get(name, name) for name in names]
+    selected = [col for col in (names if columns is None else columns) if col in names]
+    for col in required:
+        if col not in selected:
+            raise ValueError(f"Sheet '{RAW_DATA_SHEET}' thiếu cột '{col}'.")
+    positions = [names.index(col) for col in selected]
+    return selected, operator.itemgetter(*positions), max(positions) + 1
+
+def _read_filtered_raw_rows(template_file, config, columns):
+    """
+    Duyệt sheet Raw Data (read-only, streaming), chỉ giữ các cột trong columns (theo tên đã chuẩn hóa) và
+    các hàng thỏa _raw_row_predicate. Trả về DataFrame chưa chuẩn hóa.
+    """
+    wb = load_workbook(template_file, read_only=True, data_only=True, keep_links=False)
+    try:
+        if RAW_DATA_SHEET not in wb.sheetnames:
+            raise ValueError(f"Không tìm thấy sheet '{RAW_DATA_SHEET}' trong file template.")
+        rows = wb[RAW_DATA_SHEET].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame()
+
+        selected, pick, width = _raw_column_picker(header, columns, required=('Date', 'Project name'))
+        date_position, project_position = selected.index('Date'), selected.index('Project name')
+        keep = _raw_row_predicate(config)
+
+        data = []
+        for row in rows:
+            if len(row) < width:
+                row = _fit_row(row, width)
+            values = pick(row)
+            if keep(values[date_position], values[project_position]):
+                data.append(values)
+    finally:
+        wb.close()
+    return pd.DataFrame(data, columns=selected)
+
+def _get_sheet_frame(frames, sheet_name):
+    if sheet_name not in frames:
+        raise ValueError(f"Không tìm thấy sheet '{sheet_name}' trong file template.")
+    return frames[sheet_name]
+
+def _config_from_frames(frames):
+    """Phân tích cấu hình từ các sheet Config_Year_Mode và Config_Project_Filter đã đọc."""
+    try:
+        year_mode_df = _get_sheet_frame(frames, 'Config_Year_Mode')
+        project_filter_df = _get_sheet_frame(frames, 'Config_Project_Filter')
+
+        # Xử lý mode, year, months an toàn hơn
+        mode_row = year_mode_df.loc[year_mode_df['Key'].str.lower() == 'mode', 'Value']
+        mode = str(mode_row.values[0]).strip().lower() if not mode_row.empty and pd.notna(mode_row.values[0]) else 'year'
+
+        year_row = year_mode_df.loc[year_mode_df['Key'].str.lower() == 'year', 'Value']
+        year = int(year_row.values[0]) if not year_row.empty and pd.notna(year_row.values[0]) and pd.api.types.is_number(year_row.values[0]) else datetime.datetime.now().year
+        
+        months_row = year_mode_df.loc[year_mode_df['Key'].str.lower() == 'months', 'Value']
+        months = [m.strip().capitalize() for m in str(months_row.values[0]).split(',')] if not months_row.empty and pd.notna(months_row.values[0]) else []
+        
+        if 'Include' in project_filter_df.columns:
+            project_filter_df['Include'] = project_filter_df['Include'].astype(str).str.lower()
+
+        return {
+            'mode': mode,
+            'year': year,
+            'months': months,
+            'project_filter_df': project_filter_df
+        }
+    except Exception as e:
+        print(f"Lỗi khi đọc cấu hình: {e}")
+        return _default_config()
+
+RAW_COLUMN_ALIASES = {'Hou': 'Hours', 'Team member': 'Employee', 'Project Name': 'Project name'}
+MONTH_ORDER = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+EXCEL_EPOCH = pd.Timestamp('1899-12-30') # Ngày 0 của số serial ngày Excel (đúng cho mọi ngày từ 01/03/1900)
+EXCEL_SERIAL_RANGE = (1, 2958465) # 01/01/1900 .. 31/12/9999
+
+def _excel_serial_to_datetime(serials):
+    """Số serial ngày của Excel (ô ngày bị mất định dạng) -> datetime; phần lẻ là giờ trong ngày."""
+    serials = serials.where(serials.between(*EXCEL_SERIAL_RANGE))
+    return EXCEL_EPOCH + pd.to_timedelta(serials, unit='D')
+
+def _parse_date_strings(values):
+    """
+    Parse chuỗi ngày bằng MỘT định dạng đoán từ chuỗi đầu tiên đoán được, không suy luận lại cho từng hàng.
+    Mỗi chuỗi khác nhau chỉ được parse một lần (số ngày khác nhau nhỏ hơn rất nhiều so với số hàng).
+    """
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(uniques, dtype=object)
+    date_format = next((fmt for fmt in map(guess_datetime_format, uniques.head(100)) if fmt), None)
+    if date_format is None:
+        parsed = pd.to_datetime(uniques, errors='coerce')
+    else:
+        parsed = pd.to_datetime(uniques, format=date_format, errors='coerce')
+    # Mã -1 (ô trống) trỏ vào NaT được nối ở cuối
+    parsed = np.append(parsed.to_numpy(), np.datetime64('NaT'))
+    return pd.Series(parsed[codes], index=values.index)
+
+_value_type = np.frompyfunc(type, 1, 1)
+_NUMBER_TYPES = [int, float, np.int64, np.float64]
+
+def _parse_dates(values):
+    """
+    Chuyển cột Date sang datetime64, NaT với giá trị không hợp lệ:
+    cột đã là datetime được giữ nguyên, số được hiểu là serial ngày Excel, chuỗi parse theo định dạng cố định.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    kind = pd.api.types.infer_dtype(values, skipna=True)
+    if kind in ('datetime', 'datetime64', 'date'):
+        return pd.to_datetime(values, errors='coerce')
+    if kind in ('integer', 'floating', 'mixed-integer-float'):
+        return _excel_serial_to_datetime(pd.to_numeric(values, errors='coerce'))
+    if kind == 'string':
+        return _parse_date_strings(values)
+
+    # Cột trộn nhiều kiểu (thường chỉ vài ô nhập tay): xử lý riêng từng nhóm theo kiểu của giá trị
+    value_types = pd.Series(_value_type(values.to_numpy(dtype=object)), index=values.index)
+    is_number = value_types.isin(_NUMBER_TYPES).to_numpy()
+    is_string = value_types.isin([str]).to_numpy()
+    is_other = ~(is_number | is_string)
+    dates = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[us]')
+    if is_other.any():
+        dates[is_other] = pd.to_datetime(values[is_other], errors='coerce').to_numpy()
+    if is_number.any():
+        dates[is_number] = _excel_serial_to_datetime(pd.to_numeric(values[is_number], errors='coerce')).to_numpy()
+    if is_string.any():
+        dates[is_string] = _parse_date_strings(values[is_string]).to_numpy()
+    return pd.Series(dates, index=values.index)
+
+def _calendar_columns(dates):
+    """
+    Year/MonthName/Week (ISO) của từng hàng qua một bảng lịch nhỏ: các cột chỉ được tính cho mỗi NGÀY
+    (vài nghìn ngày thay vì hàng triệu hàng) rồi tra theo số thứ tự ngày. dates không chứa NaT.
+    """
+    day_ordinals = dates.to_numpy().astype('datetime64[D]').astype(np.int64)
+    if len(day_ordinals) == 0:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=object), np.empty(0, dtype=np.int64)
+    first_day, last_day = day_ordinals.min(), day_ordinals.max()
+    if last_day - first_day < max(len(day_ordinals), 366):
+        calendar_ordinals = np.arange(first_day, last_day + 1)
+        positions = day_ordinals - first_day
+    else:
+        # Vài ngày ngoại lai cách rất xa nhau: bảng chỉ gồm các ngày có mặt
+        calendar_ordinals, positions = np.unique(day_ordinals, return_inverse=True)
+
+    calendar = pd.DatetimeIndex(calendar_ordinals.astype('datetime64[D]'))
+    years = calendar.year.to_numpy()[positions]
+    month_names = np.asarray(MONTH_ORDER, dtype=object)[calendar.month.to_numpy()[positions] - 1]
+    weeks = calendar.isocalendar()['week'].to_numpy().astype(np.int64)[positions]
+    return years, month_names, weeks
+
+@instrumentation.traced('normalize_raw_data')
+def _normalize_raw_data(df):
+    """Chuẩn hóa tên cột và tạo các cột Year/MonthName/Week/Hours cho dữ liệu thô."""
+    df.columns = df.columns.str.strip()
+    df.rename(columns=RAW_COLUMN_ALIASES, inplace=True)
+    
+    df['Date'] = _parse_dates(df['Date'])
+    df = df.dropna(subset=['Date']) # Loại bỏ hàng không có ngày hợp lệ
+    
+    years, month_names, weeks = _calendar_columns(df['Date'])
+    df = df.assign(Year=years, MonthName=month_names, Week=weeks)
+    
+    # Đảm bảo cột 'Hours' là số
+    df['Hours'] = pd.to_numeric(df['Hours'], errors='coerce').fillna(0)
+    
+    return df
+
+DIMENSION_COLUMNS = ['Project name', 'Employee', 'Task', 'Workcentre']
+
+@instrumentation.traced()
+def compact_raw_frame(df):
+    """
+    Chuyển dữ liệu thô sang dạng gọn: các cột chiều (dự án, nhân viên, task, workcentre) thành
+    category với từ điển đã sắp xếp, MonthName thành category theo thứ tự tháng (mã int8 = tháng - 1),
+    Year/Week thành số nguyên nhỏ. Các bộ lọc isin/== và groupby khi đó chạy trên mã số nguyên.
+    """
+    if df.empty:
+        return df
+    df = df.copy()
+    for col in DIMENSION_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    if 'MonthName' in df.columns:
+        df['MonthName'] = pd.Categorical(df['MonthName'], categories=MONTH_ORDER, ordered=True)
+    if 'Year' in df.columns:
+        df['Year'] = df['Year'].astype('int16')
+    if 'Week' in df.columns:
+        df['Week'] = df['Week'].astype('int8')
+    return df
+
+CUBE_DIMENSIONS = ['Year', 'MonthName', 'Week', 'Project name', 'Task', 'Workcentre']
+
+@instrumentation.traced()
+def build_aggregate_cube(df, dimensions=CUBE_DIMENSIONS):
+    """
+    Tổng hợp trước Hours theo các chiều (mặc định Year × Month × Week × Project × Task × Workcentre),
+    kèm cột Rows là số hàng dữ liệu gốc. Có thể gọi lại trên một khối đã tổng hợp để cuộn lên mức thô hơn.
+    Mọi truy vấn tổng Hours theo các chiều này (apply_filters, apply_comparison_filters, các hàm export)
+    đều cho cùng kết quả khi chạy trên khối thay cho dữ liệu thô, nhưng nhanh hơn nhiều.
+    """
+    dims = [col for col in dimensions if col in df.columns]
+    if df.empty or not dims:
+        return pd.DataFrame(columns=dims + ['Hours', 'Rows'])
+    grouped = df.groupby(dims, observed=True, dropna=False, sort=False)
+    if 'Rows' in df.columns:
+        cube = grouped.agg(Hours=('Hours', 'sum'), Rows=('Rows', 'sum'))
+    else:
+        cube = grouped.agg(Hours=('Hours', 'sum'), Rows=('Hours', 'size'))
+    return cube.reset_index()
+
+STREAM_CHUNK_ROWS = 50000 # Số hàng Raw Data chuẩn hóa mỗi lượt khi nạp streaming
+STREAM_FOLD_ROWS = 200000 # Gộp các khối tạm khi tổng số hàng của chúng vượt ngưỡng này
+
+@instrumentation.traced()
+def stream_aggregate_cube(template_file, chunk_rows=STREAM_CHUNK_ROWS, dimensions=CUBE_DIMENSIONS):
+    """
+    Nạp Raw Data theo từng lô chunk_rows hàng và cộng dồn ngay vào khối tổng hợp (như build_aggregate_cube
+    trên toàn bộ dữ liệu), không bao giờ giữ toàn bộ dữ liệu thô trong bộ nhớ: bộ nhớ chỉ phụ thuộc vào
+    kích thước lô và số tổ hợp chiều khác nhau, không phụ thuộc số hàng. Lỗi được ném ra cho người gọi.
+    """
+    wb = load_workbook(template_file, read_only=True, data_only=True, keep_links=False)
+    try:
+        if RAW_DATA_SHEET not in wb.sheetnames:
+            raise ValueError(f"Không tìm thấy sheet '{RAW_DATA_SHEET}' trong file template.")
+        rows = wb[RAW_DATA_SHEET].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return build_aggregate_cube(pd.DataFrame(), dimensions)
+        # Chỉ giữ các cột cần cho chuẩn hóa và các chiều của khối
+        selected, pick, width = _raw_column_picker(header, ['Date', 'Hours'] + list(dimensions), required=('Date', 'Hours'))
+
+        partial_cubes = []
+        partial_rows = 0
+        total_rows = 0
+        while True:
+            chunk = []
+            for row in itertools.islice(rows, chunk_rows):
+                if len(row) < width:
+                    row = _fit_row(row, width)
+                values = pick(row)
+                if not all(v is None for v in values):
+                    chunk.append(values)
+            if not chunk:
+                break
+            total_rows += len(chunk)
+            with instrumentation.span('aggregate_chunk', rows_in=len(chunk)) as chunk_span:
+                cube = build_aggregate_cube(_normalize_raw_data(pd.DataFrame(chunk, columns=selected)), dimensions)
+                chunk_span.rows_out = len(cube)
+            del chunk
+            if cube.empty: # Lô không có ngày hợp lệ: bỏ qua để không làm hỏng kiểu cột khi nối
+                continue
+            partial_cubes.append(cube)
+            partial_rows += len(cube)
+            if partial_rows > STREAM_FOLD_ROWS:
+                partial_cubes = [build_aggregate_cube(pd.concat(partial_cubes, ignore_index=True), dimensions)]
+                partial_rows = len(partial_cubes[0])
+    finally:
+        wb.close()
+
+    current = instrumentation.current_span()
+    if current is not None: # Số hàng Raw Data đã đọc, trên span của stream_aggregate_cube
+        current.rows_in = total_rows
+    if not partial_cubes:
+        return build_aggregate_cube(pd.DataFrame(), dimensions)
+    return build_aggregate_cube(pd.concat(partial_cubes, ignore_index=True), dimensions)
+
+def _raw_data_from_frames(frames):
+    """Chuẩn hóa sheet Raw Data đã đọc."""
+    try:
+        return _normalize_raw_data(_get_sheet_frame(frames, RAW_DATA_SHEET))
+    except MemoryError:
+        raise
+    except Exception as e:
+        print(f"Lỗi khi tải dữ liệu thô: {e}")
+        return pd.DataFrame()
+
+@instrumentation.traced('load_incremental')
+def _load_incremental(template_file):
+    """
+    Nạp tăng dần: lấy dữ liệu đã cache, chỉ chuẩn hóa các hàng mới ở cuối Raw Data rồi nối vào.
+    Trả về (config, df_raw) hoặc None nếu không thể nạp tăng dần.
+    """
+    entry = data_cache.load_cache_entry(template_file)
+    if entry is None:
+        return None
+    _, cached_df_raw, raw_state = entry
+
+    try:
+        fingerprint = data_cache.template_fingerprint(template_file) # Trước khi đọc, xem data_cache.template_fingerprint
+        appended = _read_appended_raw_rows(template_file, raw_state)
+    except Exception as e:
+        print(f"Cảnh báo: Không thể nạp tăng dần, sẽ nạp lại toàn bộ: {e}")
+        return None
+    if appended is None: # Dữ liệu cũ trong Raw Data đã thay đổi: nạp lại toàn bộ
+        instrumentation.current_span().attributes['fallback'] = True
+        return None
+
+    frames, df_new, new_state = appended
+    config = _config_from_frames(frames)
+    df_raw = cached_df_raw
+    if not df_new.empty:
+        df_new = _normalize_raw_data(df_new) # Chỉ chuẩn hóa các hàng mới
+        if not df_new.empty:
+            df_raw = pd.concat([cached_df_raw, df_new])
+    instrumentation.current_span().attributes['appended_rows'] = new_state['row_count'] - raw_state['row_count']
+
+    data_cache.store_cached_data(template_file, config, df_raw, raw_state=new_state, fingerprint=fingerprint)
+    return config, df_raw
+
+def _index_positions(filter_index, col, values):
+    """Hợp các vị trí hàng của những giá trị được chọn (các tập rời nhau nên chỉ cần nối rồi sắp xếp)."""
+    value_positions = filter_index['columns'][col]
+    arrays = [value_positions[v] for v in values if v in value_positions]
+    if not arrays:
+        return np.empty(0, dtype=np.intp)
+    return np.sort(np.concatenate(arrays))
+
+def select_rows(df, filters, filter_index=None):
+    """
+    Lọc df theo {cột: danh sách giá trị được chọn} mà không sao chép toàn bộ df trước.
+    Có filter_index thì giao các tập vị trí rồi lấy hàng bằng một lần .iloc; nếu không thì thu hẹp dần
+    tập vị trí theo từng cột (chỉ so sánh trên các hàng còn lại) rồi cũng lấy hàng một lần.
+    """
+    if (filter_index is not None and filter_index['n_rows'] == len(df)
+            and all(col in filter_index['columns'] for col in filters)):
+        positions = None
+        for col, values in filters.items():
+            col_positions = _index_positions(filter_index, col, values)
+            positions = col_positions if positions is None else np.intersect1d(positions, col_positions, assume_unique=True)
+        return df if positions is None else df.iloc[positions]
+
+    positions = None
+    for col, values in filters.items():
+        col_values = df[col] if positions is None else df[col].take(positions)
+        keep = col_values.isin(values).to_numpy()
+        positions = np.flatnonzero(keep) if positions is None else positions[keep]
+    return df if positions is None else df.iloc[positions]
+
+@instrumentation.traced()
+def apply_filters(df, config, filter_index=None):
+    """Áp dụng các bộ lọc dữ liệu dựa trên cấu hình (filter_index: chỉ mục của df từ core_logic.build_filter_index)."""
+    if config['project_filter_df'].empty:
+        return pd.DataFrame(columns=df.columns)
+
+    filters = {}
+    if 'years' in config and config['years']: # Dành cho so sánh nhiều năm
+        filters['Year'] = list(config['years'])
+    elif 'year' in config and config['year']: # Dành cho báo cáo tiêu chuẩn một năm
+        filters['Year'] = [config['year']]
+
+    if config['months']:
+        filters['MonthName'] = list(config['months'])
+
+    filters['Project name'] = config['project_filter_df']['Project Name'].tolist()
+
+    return select_rows(df, filters, filter_index)
+
+DATABASE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+RAW_TABLE = 'raw_data'
+# Cột của khung dữ liệu thô -> cột trong bảng raw_data
+SQL_COLUMNS = {
+    'Date': 'date',
+    'Employee': 'employee',
+    'Project name': 'project',
+    'Task': 'task',
+    'Workcentre': 'workcentre',
+    'Hours': 'hours',
+    'Year': 'year',
+    'MonthName': 'month_name',
+    'Week': 'week',
+}
+DERIVED_COLUMNS = ('Year', 'MonthName', 'Week') # Tính khi nhập, luôn có trong kết quả load_raw_data
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {RAW_TABLE} (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    employee TEXT,
+    project TEXT,
+    task TEXT,
+    workcentre TEXT,
+    hours REAL NOT NULL DEFAULT 0,
+    year INTEGER NOT NULL,
+    month_name TEXT NOT NULL,
+    week INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_raw_year_month_project ON {RAW_TABLE} (year, month_name, project);
+CREATE INDEX IF NOT EXISTS idx_raw_project ON {RAW_TABLE} (project);
+CREATE TABLE IF NOT EXISTS config_year_mode (key TEXT PRIMARY KEY, value);
+CREATE TABLE IF NOT EXISTS config_project_filter (project_name TEXT, include TEXT);
+CREATE TABLE IF NOT EXISTS source_info (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+def is_database(path):
+    return str(path).lower().endswith(DATABASE_EXTENSIONS)
+
+def open_source(path, chunk_rows=STREAM_CHUNK_ROWS):
+    """
+    Nguồn dữ liệu phù hợp với path: SQLiteSource cho file cơ sở dữ liệu, ExcelSource cho workbook
+    (chunk_rows: số hàng mỗi lô khi ExcelSource.aggregate nạp theo lô).
+    """
+    return SQLiteSource(path) if is_database(path) else ExcelSource(path, chunk_rows)
+
+class ExcelSource:
+    """Workbook Excel: đọc bằng openpyxl ở chế độ read-only (streaming), chuẩn hóa bằng pandas, cache trên đĩa (data_cache)."""
+
+    def __init__(self, path, chunk_rows=STREAM_CHUNK_ROWS):
+        self.path = path
+        self.chunk_rows = chunk_rows
+
+    def load(self, include_configs=True, include_raw_data=True, use_cache=False, incremental=True):
+        """
+        Đọc cấu hình và dữ liệu thô chỉ với MỘT lần mở/parse workbook.
+        Với use_cache=True, kết quả được lấy từ/ghi vào cache trên đĩa (xem data_cache) khi file không đổi;
+        nếu file đã đổi và incremental=True, chỉ các hàng mới thêm vào cuối Raw Data được xử lý.
+        Lỗi được in ra và trả về dữ liệu rỗng, trừ MemoryError được ném ra cho người gọi.
+        """
+        template_file = self.path
+        use_cache = use_cache and include_configs and include_raw_data
+        if use_cache and os.path.exists(template_file):
+            with instrumentation.span('cache_lookup') as cache_span:
+                cached = data_cache.load_cached_data(template_file)
+                cache_span.attributes['hit'] = cached is not None
+            if cached is not None:
+                return cached
+            if incremental:
+                loaded = _load_incremental(template_file)
+                if loaded is not None:
+                    return loaded
+
+        sheet_names = (CONFIG_SHEETS if include_configs else ()) + ((RAW_DATA_SHEET,) if include_raw_data else ())
+        raw_state = {}
+        try:
+            # Dấu vân tay của file lấy trước khi đọc, xem data_cache.template_fingerprint
+            fingerprint = data_cache.template_fingerprint(template_file) if use_cache else None
+            with instrumentation.span('parse_workbook', sheets=len(sheet_names)) as parse_span:
+                frames = _read_sheet_frames(template_file, sheet_names, raw_state)
+                parse_span.rows_out = raw_state.get('row_count')
+        except FileNotFoundError:
+            print(f"Lỗi: Không tìm thấy file template tại {template_file}")
+            return _default_config(), pd.DataFrame()
+        except MemoryError:
+            raise # Người gọi chuyển sang chỉ nạp khối tổng hợp (core_logic.load_report_data)
+        except Exception as e:
+            print(f"Lỗi khi mở file template: {e}")
+            return _default_config(), pd.DataFrame()
+
+        config = _config_from_frames(frames) if include_configs else _default_config()
+        df_raw = _raw_data_from_frames(frames) if include_raw_data else pd.DataFrame()
+        if use_cache and not df_raw.empty:
+            data_cache.store_cached_data(template_file, config, df_raw, raw_state=raw_state, fingerprint=fingerprint)
+        return config, df_raw
+
+    def read_configs(self):
+        return self.load(include_raw_data=False)[0]
+
+    def load_raw_data(self, config=None, columns=REPORT_COLUMNS):
+        """
+        Dữ liệu thô đã chuẩn hóa (không có config: mọi cột và mọi hàng). Có config (cấu hình báo cáo như của
+        apply_filters): chỉ đọc các cột trong columns (None = mọi cột) và bỏ các hàng ngoài năm/tháng/dự án đã chọn
+        ngay khi duyệt sheet, kết quả như apply_filters(load_raw_data(), config) nhưng chỉ tốn công cho phần dữ liệu
+        được chọn. Không dùng cache trên đĩa.
+        """
+        if config is None:
+            return self.load(include_configs=False)[1]
+        try:
+            with instrumentation.span('parse_workbook', sheets=1) as parse_span:
+                df = _read_filtered_raw_rows(self.path, config, columns)
+                parse_span.rows_out = len(df)
+        except FileNotFoundError:
+            print(f"Lỗi: Không tìm thấy file template tại {self.path}")
+            return pd.DataFrame()
+        except Exception as e:
+            print(f"Lỗi khi tải dữ liệu thô: {e}")
+            return pd.DataFrame()
+        if df.columns.empty: # Sheet không có hàng tiêu đề
+            return df
+        # Lọc lại chính xác sau chuẩn hóa: các ô ngày không phải datetime (chuỗi, serial) chưa được lọc khi đọc.
+        # Kể cả khi không còn hàng nào, để kết quả luôn có các cột Year/MonthName/Week.
+        return apply_filters(_normalize_raw_data(df), config)
+
+    def aggregate(self, dimensions=CUBE_DIMENSIONS, config=None):
+        """
+        Tổng Hours và số hàng (Rows) theo các chiều. Không có config: Raw Data được nạp theo lô chunk_rows hàng
+        (stream_aggregate_cube), bộ nhớ không phụ thuộc số hàng; có config: chỉ các hàng được chọn được đọc.
+        """
+        if config is not None:
+            columns = list(dict.fromkeys(['Date', 'Hours', 'Project name', *dimensions]))
+            return build_aggregate_cube(self.load_raw_data(config, columns), dimensions)
+        try:
+            return stream_aggregate_cube(self.path, self.chunk_rows, dimensions)
+        except FileNotFoundError:
+            print(f"Lỗi: Không tìm thấy file template tại {self.path}")
+        except Exception as e:
+            print(f"Lỗi khi tổng hợp dữ liệu thô: {e}")
+        return build_aggregate_cube(pd.DataFrame(), dimensions)
+
+class SQLiteSource:
+    """Cơ sở dữ liệu SQLite tạo bởi import_template; lọc và tổng hợp bằng SQL."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def _connect(self):
+        """Kết nối được đóng khi ra khỏi khối with (sqlite3.Connection tự nó chỉ commit/rollback, không đóng file)."""
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(self.path)
+        return contextlib.closing(sqlite3.connect(self.path))
+
+    def load(self, include_configs=True, include_raw_data=True, use_cache=False, incremental=True):
+        """(config, df_raw) như ExcelSource.load; cơ sở dữ liệu không cần parse nên không dùng cache trên đĩa."""
+        config = self.read_configs() if include_configs else _default_config()
+        df_raw = self.load_raw_data() if include_raw_data else pd.DataFrame()
+        return config, df_raw
+
+    def read_configs(self):
+        try:
+            with self._connect() as conn:
+                frames = {
+                    'Config_Year_Mode': pd.read_sql_query(
+                        "SELECT key AS \"Key\", value AS \"Value\" FROM config_year_mode", conn),
+                    'Config_Project_Filter': pd.read_sql_query(
+                        "SELECT project_name AS \"Project Name\", include AS \"Include\" FROM config_project_filter ORDER BY rowid", conn),
+                }
+        except Exception as e:
+            print(f"Lỗi khi đọc cấu hình từ {self.path}: {e}")
+            return _default_config()
+        return _config_from_frames(frames)
+
+    def load_raw_data(self, config=None, columns=REPORT_COLUMNS):
+        """
+        Dữ liệu thô như ExcelSource.load_raw_data; bộ lọc của config được chuyển thành WHERE.
+        Có config: chỉ đọc các cột trong columns (cùng Year/MonthName/Week), None = mọi cột kể cả các cột thêm
+        của Raw Data; không có config: mọi cột.
+        """
+        if config is None:
+            columns = None
+        where, params = _where_clause(config)
+        try:
+            with self._connect() as conn:
+                sql_columns = _raw_table_columns(conn)
+                selected = [col for col in sql_columns if columns is None or col in columns or col in DERIVED_COLUMNS]
+                if where is None:
+                    return pd.DataFrame(columns=selected)
+                select = ', '.join(f'{_quote(sql_columns[col])} AS {_quote(col)}' for col in selected)
+                df = pd.read_sql_query(f"SELECT {select} FROM {RAW_TABLE}{where} ORDER BY id", conn, params=params)
+        except Exception as e:
+            print(f"Lỗi khi tải dữ liệu thô từ {self.path}: {e}")
+            return pd.DataFrame()
+        if 'Date' in df.columns:
+            df['Date'] = pd.to_datetime(df['Date'], format='ISO8601')
+        df['Year'] = df['Year'].astype('int32')
+        return df
+
+    def aggregate(self, dimensions=CUBE_DIMENSIONS, config=None):
+        """Tổng Hours và số hàng (Rows) theo các chiều, lọc theo config; GROUP BY chạy trong SQLite."""
+        dims = [col for col in dimensions if col in SQL_COLUMNS]
+        where, params = _where_clause(config)
+        if where is None or not dims:
+            return pd.DataFrame(columns=dims + ['Hours', 'Rows'])
+        group = ', '.join(SQL_COLUMNS[col] for col in dims)
+        select = ', '.join(f'{SQL_COLUMNS[col]} AS "{col}"' for col in dims)
+        query = (f"SELECT {select}, SUM(hours) AS \"Hours\", COUNT(*) AS \"Rows\" FROM {RAW_TABLE}{where} "
+                 f"GROUP BY {group} ORDER BY MIN(id)") # Thứ tự xuất hiện như build_aggregate_cube
+        try:
+            with self._connect() as conn:
+                df_cube = pd.read_sql_query(query, conn, params=params)
+        except Exception as e:
+            print(f"Lỗi khi tổng hợp dữ liệu từ {self.path}: {e}")
+            return pd.DataFrame(columns=dims + ['Hours', 'Rows'])
+        if 'Year' in df_cube.columns:
+            df_cube['Year'] = df_cube['Year'].astype('int32')
+        return df_cube
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+def _raw_table_columns(conn):
+    """{cột của khung dữ liệu thô: cột trong bảng raw_data}: các cột chuẩn, rồi các cột thêm khi nhập, rồi Year/MonthName/Week."""
+    table_columns = [row[1] for row in conn.execute(f"PRAGMA table_info({RAW_TABLE})")]
+    base = {col: sql for col, sql in SQL_COLUMNS.items() if col not in DERIVED_COLUMNS}
+    extra = {col: col for col in table_columns if col != 'id' and col not in SQL_COLUMNS.values()}
+    derived = {col: SQL_COLUMNS[col] for col in DERIVED_COLUMNS}
+    return {**base, **extra, **derived}
+
+def _where_clause(config):
+    """
+    Điều kiện WHERE (kèm tham số) tương đương apply_filters; (None, None) nếu không chọn dự án nào
+    (apply_filters trả về khung rỗng), ('', []) nếu không có config.
+    """
+    if config is None:
+        return '', []
+    project_filter_df = config['project_filter_df']
+    if project_filter_df.empty:
+        return None, None
+
+    conditions, params = [], []
+    def add_in(column, values):
+        conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+        params.extend(values)
+
+    if config.get('years'):
+        add_in('year', [int(year) for year in config['years']])
+    elif config.get('year'):
+        add_in('year', [int(config['year'])])
+    if config.get('months'):
+        add_in('month_name', list(config['months']))
+    projects = project_filter_df['Project Name'].tolist()
+    if not projects:
+        return None, None
+    add_in('project', projects)
+    return ' WHERE ' + ' AND '.join(conditions), params
+
+@instrumentation.traced()
+def load_workbook_data(template_file, include_configs=True, include_raw_data=True, use_cache=False, incremental=True, compact=False):
+    """
+    Đọc cấu hình và dữ liệu thô từ file template (workbook hoặc cơ sở dữ liệu SQLite, xem open_source)
+    với MỘT lần đọc nguồn; use_cache và incremental: xem ExcelSource.load.
+    Với compact=True, dữ liệu thô được trả về ở dạng gọn (xem compact_raw_frame).
+    Trả về tuple (config, df_raw).
+    """
+    config, df_raw = open_source(template_file).load(include_configs, include_raw_data, use_cache, incremental)
+    return config, compact_raw_frame(df_raw) if compact else df_raw
+
+def invalidate_data_cache(template_file):
+    """Xóa cache dữ liệu đã chuẩn hóa của file template (buộc đọc lại từ Excel ở lần tải sau)."""
+    return data_cache.invalidate_cache(template_file)
+
+@instrumentation.traced()
+def read_configs(template_file):
+    """Đọc cấu hình từ file template Excel hoặc cơ sở dữ liệu SQLite."""
+    return open_source(template_file).read_configs()
+
+@instrumentation.traced()
+def load_raw_data(template_file, config=None, columns=REPORT_COLUMNS):
+    """
+    Tải dữ liệu thô từ file template Excel hoặc cơ sở dữ liệu SQLite. Có config: chỉ đọc các cột trong columns và
+    các hàng được chọn (ExcelSource.load_raw_data; với SQLite, bộ lọc chạy trong SQL).
+    Dùng cho một lần đọc một báo cáo; giao diện và batch nạp một lần rồi lọc cho nhiều báo cáo (core_logic.load_report_data).
+    """
+    return open_source(template_file).load_raw_data(config, columns)
+
+@instrumentation.traced()
+def load_workbook_aggregates(template_file, chunk_rows=STREAM_CHUNK_ROWS):
+    """
+    Chế độ streaming cho workbook quá lớn: trả về (config, df_cube) với df_cube là khối tổng hợp của nguồn
+    (ExcelSource.aggregate nạp Raw Data theo lô; với SQLite, khối được tổng hợp bằng GROUP BY trong SQL).
+    Thư mục/mẫu glob: khối của từng workbook được cộng lại (không bỏ được hàng trùng giữa các file như
+    load_workbooks_data), cấu hình lấy từ file đầu tiên có cấu hình.
+    Dùng core_logic.build_report_data(df_cube, aggregated=True) để có dữ liệu cho các báo cáo.
+    """
+    paths = [] if is_database(template_file) else resolve_workbook_paths(template_file)
+    if len(paths) <= 1:
+        source = open_source(paths[0] if paths else template_file, chunk_rows)
+        return source.read_configs(), source.aggregate()
+
+    sources = [ExcelSource(path, chunk_rows) for path in paths]
+    configs = [source.read_configs() for source in sources]
+    config = next((config for config in configs if not config['project_filter_df'].empty), configs[0])
+    cubes = [df_cube for df_cube in (source.aggregate() for source in sources) if not df_cube.empty]
+    if not cubes:
+        return config, build_aggregate_cube(pd.DataFrame())
+    return config, build_aggregate_cube(pd.concat(cubes, ignore_index=True))
+
+WORKBOOK_PATTERNS = ('*.xlsx', '*.xlsm')
+
+def resolve_workbook_paths(source):
+    """
+    Danh sách workbook (đã sắp xếp) từ một file, một thư mục (mọi .xlsx/.xlsm trong thư mục) hoặc một mẫu glob.
+    Bỏ qua file khóa tạm '~$...' của Excel.
+    """
+    if os.path.isdir(source):
+        paths = [path for pattern in WORKBOOK_PATTERNS for path in glob.glob(os.path.join(source, pattern))]
+    elif glob.has_magic(source):
+        paths = glob.glob(source)
+    else:
+        paths = [source] if os.path.isfile(source) else []
+    return sorted(path for path in paths if os.path.isfile(path) and not os.path.basename(path).startswith('~$'))
+
+def _load_workbook_part(task):
+    """Nạp một workbook trong process con (hàm cấp module để dùng được với ProcessPoolExecutor)."""
+    path, use_cache = task
+    return load_workbook_data(path, use_cache=use_cache)
+
+def drop_cross_file_duplicates(df, file_ids):
+    """
+    Bỏ các hàng trùng hệt (theo hash nội dung hàng) với một hàng của file đứng trước; hàng trùng trong
+    CÙNG một file được giữ (có thể là hai lần chấm công thật sự giống nhau).
+    """
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    first_file = pd.Series(file_ids).groupby(row_hashes).transform('min').to_numpy()
+    keep = file_ids == first_file
+    return df if keep.all() else df[keep]
+
+@instrumentation.traced()
+def load_workbooks_data(source, workers=None, use_cache=False, deduplicate=True, compact=False):
+    """
+    Nạp nhiều workbook (thư mục hoặc mẫu glob, xem resolve_workbook_paths), mỗi file được parse và chuẩn hóa
+    như load_workbook_data trên một process riêng (workers: số process, None = số nhân CPU).
+    Dữ liệu được nối một lần, bỏ hàng trùng giữa các file nếu deduplicate. Cấu hình lấy từ file đầu tiên có cấu hình.
+    Với compact=True, dữ liệu thô sau khi nối được chuyển sang dạng gọn (xem compact_raw_frame).
+    Trả về tuple (config, df_raw) như load_workbook_data.
+    """
+    paths = resolve_workbook_paths(source)
+    if not paths:
+        print(f"Lỗi: Không tìm thấy workbook nào tại {source}")
+        return _default_config(), pd.DataFrame()
+    if len(paths) == 1:
+        return load_workbook_data(paths[0], use_cache=use_cache, compact=compact)
+
+    tasks = [(path, use_cache) for path in paths]
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_load_workbook_part, tasks))
+    else:
+        results = [_load_workbook_part(task) for task in tasks]
+
+    config = next((config for config, _ in results if not config['project_filter_df'].empty), results[0][0])
+    frames, file_ids = [], []
+    for file_id, (path, (_, df_raw)) in enumerate(zip(paths, results)):
+        if df_raw.empty:
+            print(f"Cảnh báo: Không có dữ liệu Raw Data trong {path}, bỏ qua.")
+            continue
+        frames.append(df_raw)
+        file_ids.append(np.full(len(df_raw), file_id, dtype=np.int32))
+    if not frames:
+        return config, pd.DataFrame()
+
+    with instrumentation.span('concat_workbooks', files=len(frames)) as concat_span:
+        df_raw = pd.concat(frames, ignore_index=True)
+        concat_span.rows_in = len(df_raw)
+        if deduplicate:
+            df_raw = drop_cross_file_duplicates(df_raw, np.concatenate(file_ids))
+        concat_span.rows_out = len(df_raw)
+    # Chuyển sang dạng gọn sau khi nối: nối các cột category có từ điển khác nhau sẽ trả về cột object
+    return config, compact_raw_frame(df_raw) if compact else df_raw
+
+def import_template(template_file, db_path, replace=True):
+    """
+    Chuyển một template Excel (hoặc thư mục/mẫu glob, xem load_workbooks_data) thành cơ sở dữ liệu
+    SQLite: dữ liệu thô đã chuẩn hóa và cấu hình. replace=False thì thêm hàng vào bảng đã có.
+    Các cột của Raw Data ngoài SQL_COLUMNS được thêm vào bảng raw_data với tên gốc. Trả về số hàng đã ghi.
+    """
+    config, df_raw = load_workbooks_data(template_file)
+    if df_raw.empty:
+        raise ValueError(f"Không có dữ liệu Raw Data trong {template_file}.")
+
+    extra_columns = [col for col in df_raw.columns if col not in SQL_COLUMNS]
+    rows = df_raw[[col for col in SQL_COLUMNS if col in df_raw.columns] + extra_columns].rename(columns=SQL_COLUMNS)
+    rows['date'] = df_raw['Date'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    with contextlib.closing(sqlite3.connect(db_path)) as conn:
+        with conn: # Một giao dịch: commit khi thành công, rollback khi lỗi
+            if replace:
+                conn.executescript(f"DROP TABLE IF EXISTS {RAW_TABLE}; DROP TABLE IF EXISTS config_year_mode; "
+                                   "DROP TABLE IF EXISTS config_project_filter; DROP TABLE IF EXISTS source_info;")
+            conn.executescript(SCHEMA)
+            existing = {row[1] for row in conn.execute(f"PRAGMA table_info({RAW_TABLE})")}
+            for col in extra_columns:
+                if str(col) not in existing:
+                    conn.execute(f"ALTER TABLE {RAW_TABLE} ADD COLUMN {_quote(col)}")
+            rows.to_sql(RAW_TABLE, conn, if_exists='append', index=False, chunksize=50000)
+
+            conn.execute("DELETE FROM config_year_mode")
+            conn.executemany("INSERT INTO config_year_mode (key, value) VALUES (?, ?)", [
+                ('Mode', config['mode']),
+                ('Year', int(config['year'])),
+                ('Months', ', '.join(config['months']) if config['months'] else None),
+            ])
+            project_filter_df = config['project_filter_df']
+            conn.execute("DELETE FROM config_project_filter")
+            if 'Project Name' in project_filter_df.columns:
+                includes = project_filter_df['Include'] if 'Include' in project_filter_df.columns else ['yes'] * len(project_filter_df)
+                conn.executemany("INSERT INTO config_project_filter (project_name, include) VALUES (?, ?)",
+                                 [(str(name), str(include)) for name, include in zip(project_filter_df['Project Name'], includes)])
+            conn.executemany("INSERT OR REPLACE INTO source_info (key, value) VALUES (?, ?)", [
+                ('template', os.path.abspath(template_file)),
+                ('imported_at', datetime.datetime.now().isoformat(timespec='seconds')),
+            ])
+    return len(rows)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Quản lý nguồn dữ liệu Time Report.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    import_parser = subparsers.add_parser('import', help="Chuyển template Excel thành cơ sở dữ liệu SQLite")
+    import_parser.add_argument('template', help="File template (hoặc thư mục/mẫu glob các workbook)")
+    import_parser.add_argument('database', help="File SQLite đích (.db/.sqlite)")
+    import_parser.add_argument('--append', action='store_true', help="Thêm hàng vào cơ sở dữ liệu đã có thay vì tạo lại")
+    args = parser.parse_args(argv)
+
+    if not is_database(args.database):
+        print(f"Lỗi: File đích phải có đuôi {', '.join(DATABASE_EXTENSIONS)}.")
+        return 2
+    try:
+        count = import_template(args.template, args.database, replace=not args.append)
+    except (OSError, ValueError, MemoryError, sqlite3.Error) as e:
+        print(f"Lỗi khi nhập dữ liệu: {e}")
+        return 1
+    print(f"Đã nhập {count} hàng từ {args.template} vào {args.database}.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
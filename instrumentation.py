@@ -0,0 +1,172 @@
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+try:
+    import resource # Chỉ có trên Linux/macOS
+except ImportError:
+    resource = None
+
+try:
+    import psutil # Tùy chọn; trên Windows là cách duy nhất để đọc bộ nhớ đỉnh của process
+except ImportError:
+    psutil = None
+
+# Đo thời gian và bộ nhớ của từng bước xử lý (đọc workbook, lọc, tổng hợp, vẽ biểu đồ, lưu file...).
+# Mỗi bước là một "span": tên, thời gian chạy, số hàng vào/ra, mức tăng bộ nhớ đỉnh (RSS) của process.
+# Các span gần nhất được giữ trong bộ nhớ (get_spans); có thể ghi thêm ra file JSON lines bằng
+# enable_json_log(path) hoặc biến môi trường TIME_REPORT_TRACE_LOG.
+
+MAX_SPANS = 1000
+TRACE_LOG_ENV = 'TIME_REPORT_TRACE_LOG'
+
+_spans = deque(maxlen=MAX_SPANS)
+_lock = threading.Lock()
+_local = threading.local()
+_json_log_path = os.environ.get(TRACE_LOG_ENV) or None
+
+def _peak_rss_bytes():
+    """Bộ nhớ RSS đỉnh của process (byte), hoặc None nếu không đọc được trên nền tảng này."""
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        peak = getattr(info, 'peak_wset', None) # Windows
+        if peak is not None:
+            return peak
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024 # Linux trả về KB
+    if psutil is not None:
+        return psutil.Process().memory_info().rss # Không có giá trị đỉnh: dùng RSS hiện tại
+    return None
+
+def _row_count(value):
+    """Số hàng của DataFrame, hoặc của DataFrame đầu tiên trong tuple kết quả; None nếu không có."""
+    if hasattr(value, 'shape'):
+        return int(value.shape[0])
+    if isinstance(value, tuple):
+        for item in value:
+            if hasattr(item, 'shape'):
+                return int(item.shape[0])
+    return None
+
+class Span:
+    """Một bước đã đo. rows_out và attributes có thể được gán bên trong khối with."""
+
+    def __init__(self, name, rows_in=None, parent=None, attributes=None):
+        self.name = name
+        self.parent = parent
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.attributes = dict(attributes or {})
+        self.started_at = time.time()
+        self.seconds = None
+        self.peak_rss_delta = None
+        self.error = None
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'parent': self.parent,
+            'started_at': round(self.started_at, 3),
+            'seconds': round(self.seconds, 6) if self.seconds is not None else None,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'peak_rss_delta': self.peak_rss_delta,
+            'error': self.error,
+            **self.attributes,
+        }
+
+def _record(finished_span):
+    with _lock:
+        _spans.append(finished_span)
+        log_path = _json_log_path
+    if log_path:
+        try:
+            with open(log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(finished_span.to_dict(), default=str) + '\n')
+        except OSError as e:
+            print(f"Cảnh báo: Không ghi được log đo hiệu năng vào {log_path}: {e}")
+
+@contextlib.contextmanager
+def span(name, rows_in=None, **attributes):
+    """
+    Đo một bước xử lý:
+        with instrumentation.span('apply_filters', rows_in=len(df)) as s:
+            ...
+            s.rows_out = len(result)
+    Span lồng nhau ghi nhận tên span cha (trong cùng luồng).
+    """
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    current = Span(name, rows_in, stack[-1].name if stack else None, attributes)
+    stack.append(current)
+    peak_before = _peak_rss_bytes()
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.seconds = time.perf_counter() - start
+        peak_after = _peak_rss_bytes()
+        if peak_before is not None and peak_after is not None:
+            current.peak_rss_delta = peak_after - peak_before
+        stack.pop()
+        _record(current)
+
+def current_span():
+    """Span đang mở trong cùng luồng (ví dụ span của hàm có @traced), hoặc None."""
+    stack = getattr(_local, 'stack', None)
+    return stack[-1] if stack else None
+
+def traced(name=None):
+    """Decorator: đo cả hàm; rows_in/rows_out lấy từ DataFrame đầu tiên trong tham số/kết quả."""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            rows_in = next((count for count in map(_row_count, args) if count is not None), None)
+            with span(span_name, rows_in=rows_in) as current:
+                result = func(*args, **kwargs)
+                current.rows_out = _row_count(result)
+                return result
+        return wrapper
+    return decorator
+
+def get_spans(name=None):
+    """Danh sách các span đã ghi (cũ nhất trước) dưới dạng dict; lọc theo tên nếu có."""
+    with _lock:
+        spans = list(_spans)
+    return [s.to_dict() for s in spans if name is None or s.name == name]
+
+def clear_spans():
+    with _lock:
+        _spans.clear()
+
+def summarize(spans=None):
+    """Tổng thời gian và số lần gọi theo tên span, sắp xếp theo tổng thời gian giảm dần."""
+    totals = {}
+    for item in spans if spans is not None else get_spans():
+        entry = totals.setdefault(item['name'], {'name': item['name'], 'calls': 0, 'seconds': 0.0})
+        entry['calls'] += 1
+        entry['seconds'] += item['seconds'] or 0.0
+    return sorted(totals.values(), key=lambda entry: entry['seconds'], reverse=True)
+
+def enable_json_log(path):
+    """Ghi thêm mỗi span hoàn tất thành một dòng JSON vào path."""
+    global _json_log_path
+    with _lock:
+        _json_log_path = path
+
+def disable_json_log():
+    global _json_log_path
+    with _lock:
+        _json_log_path = None
@@ -0,0 +1,120 @@
+import atexit
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+# Chia sẻ dữ liệu thô đã chuẩn hóa với các process con (ProcessPoolExecutor) qua multiprocessing.shared_memory:
+# mỗi cột được ghi MỘT lần vào một vùng nhớ chia sẻ, process con gắn vào vùng nhớ đó mà không sao chép
+# (thay vì nhận bản pickle của cả DataFrame trong từng task - rất chậm với spawn trên Windows).
+#   - cột số/ngày giờ: buffer numpy nguyên bản
+#   - cột chuỗi/category/khác: mã số nguyên (factorize), bảng giá trị nhỏ đi kèm handle
+# publish_frame trả về handle (dict picklable) để truyền cho process con; SharedRows(handle, positions) là một tập
+# hàng của khung đã chia sẻ, process con lấy lại bằng .load(). Vùng nhớ được giải phóng bằng release_frames
+# (khi xong lượt chạy batch) và tự động khi thoát chương trình.
+
+NUMERIC_KINDS = 'biufcmM' # bool, int, uint, float, complex, timedelta, datetime
+
+class SharedFrameManager:
+    """Quản lý vòng đời các vùng nhớ chia sẻ do process này tạo, theo khóa (mỗi khóa là một khung)."""
+
+    def __init__(self):
+        self._segments = {}
+        self._lock = threading.Lock()
+
+    def publish(self, df, key='df_raw'):
+        """Ghi các cột của df vào vùng nhớ chia sẻ (thay cho khung cũ cùng khóa) và trả về handle."""
+        self.release(key)
+        segments, columns = [], []
+        try:
+            for name in df.columns:
+                values, dtype, uniques = _encode_column(df[name])
+                shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+                segments.append(shm)
+                np.ndarray(values.shape, values.dtype, buffer=shm.buf)[:] = values
+                columns.append({'name': name, 'segment': shm.name, 'buffer_dtype': values.dtype,
+                                'dtype': dtype, 'uniques': uniques})
+        except Exception:
+            _release_segments(segments)
+            raise
+        with self._lock:
+            self._segments[key] = segments
+        return {'key': key, 'n_rows': len(df), 'columns': columns}
+
+    def release(self, key=None):
+        """Giải phóng vùng nhớ của một khóa, hoặc của mọi khóa nếu key là None."""
+        with self._lock:
+            keys = list(self._segments) if key is None else [key]
+            released = [self._segments.pop(k) for k in keys if k in self._segments]
+        for segments in released:
+            _release_segments(segments)
+
+def _release_segments(segments):
+    for shm in segments:
+        try:
+            shm.close()
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+def _encode_column(series):
+    """(mảng numpy để ghi vào vùng nhớ, dtype gốc, bảng giá trị của mã hoặc None cho cột số)."""
+    dtype = series.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind in NUMERIC_KINDS:
+        return np.ascontiguousarray(series.to_numpy()), dtype, None
+    if isinstance(dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), dtype, None
+    # Giá trị thiếu có mã riêng trong bảng (không dùng mã -1: Index.take sẽ hiểu -1 là phần tử cuối)
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    return codes.astype(np.int32, copy=False), dtype, uniques
+
+_manager = SharedFrameManager()
+atexit.register(_manager.release)
+
+def publish_frame(df, key='df_raw'):
+    return _manager.publish(df, key)
+
+def release_frames(key=None):
+    _manager.release(key)
+
+# Phía process con: các vùng nhớ đã gắn, dùng lại cho mọi task của cùng process
+_attached = {}
+
+def _column_buffer(column, n_rows):
+    shm = _attached.get(column['segment'])
+    if shm is None:
+        shm = shared_memory.SharedMemory(name=column['segment'])
+        _attached[column['segment']] = shm
+    return np.ndarray((n_rows,), column['buffer_dtype'], buffer=shm.buf)
+
+def take_rows(handle, positions=None):
+    """
+    Các hàng tại positions (None = mọi hàng) của khung đã chia sẻ, cùng cột và dtype như khung gốc
+    (index đánh lại từ 0). Chỉ các hàng được chọn được sao chép ra khỏi vùng nhớ chia sẻ.
+    Giá trị thiếu giữ nguyên là NA (None trong cột object trở thành NaN, ghi ra Excel như nhau: ô trống).
+    """
+    data = {}
+    for column in handle['columns']:
+        values = _column_buffer(column, handle['n_rows'])
+        values = values.copy() if positions is None else values.take(positions)
+        if column['uniques'] is not None:
+            data[column['name']] = pd.Series(column['uniques'].take(values), dtype=column['dtype'])
+        elif isinstance(column['dtype'], pd.CategoricalDtype):
+            data[column['name']] = pd.Categorical.from_codes(values, dtype=column['dtype'])
+        else:
+            data[column['name']] = values
+    return pd.DataFrame(data, columns=[column['name'] for column in handle['columns']])
+
+class SharedRows:
+    """Một tập hàng của khung đã chia sẻ: chỉ handle và vị trí hàng được pickle khi gửi sang process con."""
+
+    def __init__(self, handle, positions):
+        self.handle = handle
+        self.positions = np.asarray(positions, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def load(self):
+        return take_rows(self.handle, self.positions)
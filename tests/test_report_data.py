@@ -0,0 +1,22 @@
+import pandas as pd
+
+import benchmark
+import core_logic
+import data_source
+
+def test_memory_error_falls_back_to_aggregates(tmp_path, monkeypatch):
+    template = benchmark.generate_workbook(str(tmp_path / 'template.xlsx'), rows=300, projects=3, tasks=4, years=1, start_year=2024)
+    expected = core_logic.load_report_data(template, aggregated=True)
+
+    read_sheet_frames = data_source._read_sheet_frames
+    def out_of_memory(template_file, sheet_names, raw_state=None):
+        if data_source.RAW_DATA_SHEET in sheet_names:
+            raise MemoryError()
+        return read_sheet_frames(template_file, sheet_names, raw_state)
+    monkeypatch.setattr(data_source, '_read_sheet_frames', out_of_memory)
+
+    report_data = core_logic.load_report_data(template)
+    assert report_data['aggregated']
+    pd.testing.assert_frame_equal(report_data['df_cube'], expected['df_cube'])
+    df_filtered, df_aggregates, include_raw_data = core_logic.standard_report_frames(report_data, report_data['config'])
+    assert not include_raw_data and df_filtered is df_aggregates
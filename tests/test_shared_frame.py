@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+import batch_report
+import benchmark
+import shared_frame
+
+@pytest.fixture
+def published():
+    keys = []
+    def publish(df, key):
+        keys.append(key)
+        return shared_frame.publish_frame(df, key)
+    yield publish
+    for key in keys:
+        shared_frame.release_frames(key)
+
+def _frame_with_missing_values():
+    return pd.DataFrame({
+        'object': pd.Series(['a', np.nan, 'b', 'a'], dtype=object),
+        'string': pd.Series(['a', None, 'b', 'a'], dtype='str'),
+        'category': pd.Categorical(['x', None, 'y', 'x']),
+        'float': [1.0, np.nan, 2.0, 3.0],
+        'date': pd.to_datetime(['2024-01-01', None, '2024-01-02', '2024-01-03']),
+    })
+
+def test_round_trip_keeps_missing_values(published):
+    df = _frame_with_missing_values()
+    handle = published(df, 'test_round_trip')
+    pd.testing.assert_frame_equal(shared_frame.take_rows(handle), df)
+
+def test_shared_rows_subset(published):
+    df = _frame_with_missing_values()
+    rows = shared_frame.SharedRows(published(df, 'test_subset'), [3, 1])
+    pd.testing.assert_frame_equal(rows.load(), df.iloc[[3, 1]].reset_index(drop=True))
+
+def _sheet_values(path):
+    wb = load_workbook(path, read_only=True)
+    try:
+        return {ws.title: list(ws.values) for ws in wb.worksheets}
+    finally:
+        wb.close()
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_parallel_batch_matches_sequential(tmp_path, streaming):
+    template = benchmark.generate_workbook(str(tmp_path / 'template.xlsx'), rows=600, projects=4, tasks=5, years=1, start_year=2024)
+    wb = load_workbook(template)
+    ws = wb['Raw Data']
+    for row in range(2, ws.max_row + 1, 5):
+        ws.cell(row=row, column=4).value = None # Ô Task trống
+    wb.save(template)
+
+    projects = [f"P{i:04d} Project {i}" for i in range(4)]
+    manifest = {'reports': [
+        {'name': f'R{i}', 'type': 'standard', 'formats': ['excel'], 'mode': 'month', 'year': 2024, 'months': [], 'projects': projects[i:i + 2]}
+        for i in range(3)
+    ]}
+    outputs = {}
+    for workers in (1, 2):
+        results = batch_report.run_batch(manifest, template, str(tmp_path / f'out{workers}'), workers, use_cache=False, streaming=streaming)
+        assert results and all(success for _, success in results)
+        outputs[workers] = {path.split('out%d' % workers)[1]: _sheet_values(path) for path, _ in results}
+    assert outputs[1] == outputs[2]
@@ -0,0 +1,12 @@
+import pytest
+
+import benchmark
+
+# Ngân sách import và các module nặng phải được import trễ: xem benchmark.STARTUP_BUDGETS
+@pytest.mark.parametrize('module', sorted(benchmark.STARTUP_BUDGETS))
+def test_import_budget(module):
+    budget, deferred_modules = benchmark.STARTUP_BUDGETS[module]
+    seconds, modules = benchmark.measure_import(module)
+    assert seconds <= budget, f"import {module} mất {seconds:.3f} s, vượt ngân sách {budget:.2f} s"
+    imported_early = [heavy for heavy in deferred_modules if heavy in modules]
+    assert not imported_early, f"import {module} đã import sớm {imported_early}"